@@ -37,6 +37,21 @@ COMMENT_CONFIG = {
 PERFORMANCE_CONFIG = {
     # 扫描间隔（分钟）
     "scan_interval_minutes": 10,
+
+    # 视频处理并发数 - 同时处理的新视频数量上限
+    "video_concurrency": 3,
+
+    # 对话检查并发数 - 同时检查的对话数量上限
+    "conv_check_concurrency": 5,
+
+    # 错误记录环形缓冲区大小 - 长期运行时只保留最近N条错误
+    "error_ring_size": 500,
+
+    # 视频摘要缓存时间（小时）- 视频简介基本不变，可长期复用
+    "video_summary_ttl_hours": 6,
+
+    # 评论区上下文缓存时间（分钟）- 评论区变化较快，短期复用
+    "comments_context_ttl_minutes": 10,
 }
 
 # ============================================================================
@@ -3,6 +3,8 @@
 
 安全提示：此文件包含敏感信息（API密钥、Cookie），请勿提交到公共仓库
 """
+import bisect
+import re
 from pathlib import Path
 
 # 项目根目录
@@ -81,6 +83,40 @@ EMERGENCY_KEYWORDS = [
     "无合理理由赠与私人物品", "向人们道别"
 ]
 
+# 预编译的紧急关键词匹配器：全部关键词合成一个正则，
+# 一次C级扫描替代逐词 in 检查（关键词越多收益越大）
+_EMERGENCY_PATTERN = re.compile("|".join(map(re.escape, EMERGENCY_KEYWORDS)))
+
+
+def contains_emergency_keyword(text: str) -> bool:
+    """判断文本是否命中紧急关键词（本地快速检测，不依赖AI分析）"""
+    return bool(text) and _EMERGENCY_PATTERN.search(text) is not None
+
+
+def contains_emergency_keywords_batch(texts) -> list:
+    """批量判断多段文本是否命中紧急关键词
+
+    所有文本用\\x00拼成一个长串只扫描一次（关键词不含\\x00，
+    不会跨段误匹配），命中位置经bisect映射回对应文本下标。
+    整页评论的检测开销≈单次正则扫描。
+    """
+    if not texts:
+        return []
+
+    joined = "\x00".join(t or "" for t in texts)
+    flags = [False] * len(texts)
+
+    # 每段文本在长串中的起始偏移
+    starts = [0]
+    for t in texts[:-1]:
+        starts.append(starts[-1] + len(t or "") + 1)
+
+    for m in _EMERGENCY_PATTERN.finditer(joined):
+        flags[bisect.bisect_right(starts, m.start()) - 1] = True
+
+    return flags
+
+
 # 场景优先级
 SCENE_PRIORITY = {
     "high": ["心理健康", "原生家庭", "失去"],
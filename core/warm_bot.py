@@ -13,23 +13,25 @@
 """
 
 import asyncio
+import collections
+import sys
+import functools
 import logging
+import heapq
+import queue
 import time
-from datetime import datetime, timedelta
-from pathlib import Path
+from logging.handlers import QueueHandler, QueueListener
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional
 from bilibili_api import video, comment
 from bilibili_api.comment import CommentResourceType, OrderType, Comment
 from bilibili_api.utils.network import Credential
 from bilibili_api.utils.aid_bvid_transformer import bvid2aid
 
-import sys
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 from config import (
     BILIBILI_COOKIE, NEGATIVE_KEYWORDS,
     SEARCH_CONFIG, COMMENT_CONFIG, LOG_FILE, ERROR_LOG_FILE,
-    SCENE_PRIORITY, EMERGENCY_LOG
+    SCENE_PRIORITY, EMERGENCY_LOG, contains_emergency_keywords_batch
 )
 from config.bot_config import PERFORMANCE_CONFIG, CONVERSATION_CONFIG
 
@@ -39,9 +41,102 @@ from modules import VideoContentExtractor, CommentInteractor
 from modules.comment_context import CommentContextFetcher
 
 from utils.circuit_breaker import bilibili_breaker, deepseek_breaker
-from utils.rate_limiter import bilibili_limiter, deepseek_limiter, comment_limiter
+from utils.rate_limiter import (
+    bilibili_search_limiter, bilibili_comments_limiter,
+    deepseek_limiter, comment_limiter
+)
 from utils.retry_handler import bilibili_retry, deepseek_retry
 
+# Cookie在模块导入时解析一次，避免每次实例化重复字符串处理
+_COOKIES = dict(
+    item.strip().split('=', 1)
+    for item in BILIBILI_COOKIE.split(';')
+    if '=' in item
+)
+_BOT_UID_STR = str(_COOKIES.get('DedeUserID') or '')
+
+# 本地时区在导入时确定一次，避免热路径上反复推导
+_LOCAL_TZ = datetime.now().astimezone().tzinfo
+
+# 健康检查的关键项，任何一项失败直接判定不通过
+_CRITICAL_CHECKS = frozenset({"B站凭据", "数据库"})
+
+# 解构子评论时的空字典占位，避免每条回复分配新的 {}
+_EMPTY: Dict = {}
+
+# 紧急情况日志模板：模块级构建一次，记录时只做format_map
+_EMERGENCY_TEMPLATE = """
+================================================================================
+🚨 紧急情况记录 - {time}
+================================================================================
+
+📺 视频信息:
+   标题: {title}
+   BV号: {bvid}
+   链接: https://www.bilibili.com/video/{bvid}
+
+👤 用户信息:
+   用户名: {username}
+   UID: {user_mid}
+   主页: https://space.bilibili.com/{user_mid}
+
+💬 用户评论:
+   {content}
+
+🤖 我的回复:
+   {reply}
+
+📊 情感分析:
+   情感类型: {emotion}
+   情感分数: {sentiment_score:.2f} (越负越严重)
+
+⚠️  建议操作:
+   1. 点击用户主页查看其近期动态
+   2. 关注该用户是否有后续回复
+   3. 如有必要，考虑私信关心（但避免说教）
+   4. 记录处理时间和方式
+
+================================================================================
+
+"""
+
+
+def _unpack_reply(reply: Dict) -> tuple:
+    """一次性解构子评论的常用字段
+
+    Returns:
+        (rpid_str, user_mid_str, uname, parent_id_raw, message)
+    """
+    member = reply.get('member') or _EMPTY
+    content = reply.get('content') or _EMPTY
+    rpid = reply.get('rpid')
+    user_mid = member.get('mid')
+    return (
+        str(rpid) if rpid else None,
+        str(user_mid) if user_mid else None,
+        member.get('uname', '用户'),
+        reply.get('parent', 0),
+        content.get('message', ''),
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def _bvid2aid(bvid: str) -> int:
+    """bvid2aid 是纯函数，缓存结果避免同一视频反复换算"""
+    return bvid2aid(bvid)
+
+
+def _to_local_naive(ts) -> datetime:
+    """把数据库时间戳统一转为本地naive datetime（created_at 存储的是 UTC）"""
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts.replace('Z', '+00:00'))
+        # 如果时间是 naive（无时区），假设为 UTC 再转回本地
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(_LOCAL_TZ).replace(tzinfo=None)
+    return ts
+
 
 class WarmBot:
     """
@@ -65,27 +160,58 @@ class WarmBot:
         self.comment_interactor: Optional[CommentInteractor] = None
         self.comment_context_fetcher: Optional[CommentContextFetcher] = None
         
-        # 机器人自己的UID（用于排除自己的回复）
+        # 机器人自己的UID（用于排除自己的回复，已预转为字符串）
         self.bot_uid: Optional[str] = None
+        self._bot_uid_str: str = _BOT_UID_STR
         
         self.running = False
+        self._stop_event = asyncio.Event()
         self._print_lock = asyncio.Lock()
+        self._out_buf: List[str] = []
         self._initialized = False
+
+        # 子评论页缓存（每周期重置）：同一 (bvid, root_id) 的对话共享一次API请求
+        self._subcomment_cache: Dict[tuple, asyncio.Task] = {}
+
+        # 视频内容/评论区上下文缓存（每周期重置）：同一bvid的对话共享一次提取
+        # 值为 (过期时间monotonic, 任务)，跨扫描周期按TTL复用
+        self._video_content_cache: Dict[str, tuple] = {}
+        self._comments_ctx_cache: Dict[tuple, tuple] = {}
+        self._content_cache_max = 128
+
+        # 紧急情况日志队列：短暂攒批后一次写盘，避免并发时的线程唤醒风暴
+        self._emergency_queue: List[str] = []
+        self._emergency_flush_task: Optional[asyncio.Task] = None
+
+        # 对话跟进调度堆：(next_check_at, conv_id)，调度器睡到最早到期时间
+        self._due_heap: List[tuple] = []
+        self._due_event = asyncio.Event()
         
-        # 统计
+        # 统计（errors用环形缓冲区，长期运行不会无限增长）
         self._stats = {
             'videos_processed': 0,
             'replies_processed': 0,
             'replies_sent': 0,
             'api_calls': 0,
             'start_time': None,
-            'errors': []
+            'errors': collections.deque(
+                maxlen=PERFORMANCE_CONFIG.get('error_ring_size', 500)
+            )
         }
     
     async def _print(self, text: str):
-        """线程安全的打印输出"""
+        """缓冲输出，由 _flush_output 在同步点统一写出"""
+        async with self._print_lock:
+            self._out_buf.append(text)
+
+    async def _flush_output(self):
+        """把缓冲的输出一次性写出（每次flush只有一个write调用）"""
         async with self._print_lock:
-            print(text)
+            if not self._out_buf:
+                return
+            sys.stdout.write('\n'.join(self._out_buf) + '\n')
+            sys.stdout.flush()
+            self._out_buf.clear()
     
     async def initialize(self) -> bool:
         """
@@ -130,7 +256,12 @@ class WarmBot:
     async def cleanup(self):
         """清理资源"""
         self.logger.info("🧹 开始清理资源...")
-        
+
+        # 冲刷还在队列里的紧急情况记录
+        if self._emergency_queue:
+            batch, self._emergency_queue = self._emergency_queue, []
+            self._write_emergency_log(batch)
+
         # 关闭分析器（释放HTTP客户端）
         if self.analyzer and hasattr(self.analyzer, 'close'):
             try:
@@ -148,63 +279,75 @@ class WarmBot:
                 self.logger.warning(f"   关闭数据库失败: {e}")
         
         self.logger.info("✅ 资源清理完成")
+
+        # 停止日志监听线程（冲刷队列中剩余的日志）
+        if getattr(self, '_log_listener', None):
+            try:
+                self._log_listener.stop()
+                self._log_listener = None
+            except Exception:
+                pass
     
     async def _init_database(self):
         """初始化数据库"""
-        # 数据库已经在__init__中初始化，这里可以添加额外检查
-        pass
+        # 表结构已在__init__中同步建好，这里打开长连接（WAL模式）
+        await self.db.connect()
     
     async def _health_check(self) -> bool:
         """
         健康检查 - 验证关键依赖
-        
+
+        关键项（凭据、数据库）失败时立即返回，不再继续后续探测。
+
         Returns:
             是否通过健康检查
         """
         self.logger.info("🏥 执行健康检查...")
         checks = []
-        
+
+        def _report(name: str, status: bool, msg: str) -> bool:
+            """记录一项检查结果，关键项失败时返回False触发提前退出"""
+            checks.append((name, status, msg))
+            icon = "✅" if status else "❌"
+            self.logger.info(f"   {icon} {name}: {msg}")
+            if not status and name in _CRITICAL_CHECKS:
+                self.logger.error(f"❌ 关键检查失败: {name} - {msg}")
+                return False
+            return True
+
         # 1. 检查B站凭据
         try:
             # 简单验证凭据格式
             if not self.credential.sessdata:
-                checks.append(("B站凭据", False, "SESSDATA为空"))
+                ok = _report("B站凭据", False, "SESSDATA为空")
             else:
-                checks.append(("B站凭据", True, "格式正确"))
+                ok = _report("B站凭据", True, "格式正确")
         except Exception as e:
-            checks.append(("B站凭据", False, str(e)))
-        
+            ok = _report("B站凭据", False, str(e))
+        if not ok:
+            return False
+
         # 2. 检查数据库连接
         try:
             # 尝试简单查询
-            test_conv = await self.db.get_replied_conversations_to_check()
-            checks.append(("数据库", True, "连接正常"))
+            await self.db.get_replied_conversations_to_check()
+            ok = _report("数据库", True, "连接正常")
         except Exception as e:
-            checks.append(("数据库", False, str(e)))
-        
-        # 3. 检查AI分析器
+            ok = _report("数据库", False, str(e))
+        if not ok:
+            return False
+
+        # 3. 检查AI分析器（非关键，仅诊断）
         try:
             # 检查API密钥
             if hasattr(self.analyzer, 'api_key') and self.analyzer.api_key:
-                checks.append(("AI分析器", True, "配置正确"))
+                _report("AI分析器", True, "配置正确")
             else:
-                checks.append(("AI分析器", False, "API密钥未配置"))
+                _report("AI分析器", False, "API密钥未配置")
         except Exception as e:
-            checks.append(("AI分析器", False, str(e)))
-        
-        # 打印检查结果
-        for name, status, msg in checks:
-            icon = "✅" if status else "❌"
-            self.logger.info(f"   {icon} {name}: {msg}")
-        
-        # 关键检查必须通过
-        critical_checks = ["B站凭据", "数据库"]
-        all_passed = all(
-            status for name, status, _ in checks 
-            if name in critical_checks
-        )
-        
-        return all_passed
+            _report("AI分析器", False, str(e))
+
+        return True
     
     def _setup_logging(self) -> logging.Logger:
         """配置日志"""
@@ -230,13 +373,19 @@ class WarmBot:
         console_handler.setFormatter(formatter)
         console_handler.setLevel(logging.WARNING)
         
-        # 根日志器
+        # 日志经由队列转发到后台线程写入，避免文件I/O阻塞事件循环
+        log_queue = queue.SimpleQueue()
+        self._log_listener = QueueListener(
+            log_queue, file_handler, error_handler, console_handler,
+            respect_handler_level=True
+        )
+        self._log_listener.start()
+
+        # 根日志器只挂QueueHandler，热路径上的日志调用仅入队
         root_logger = logging.getLogger()
         root_logger.setLevel(logging.INFO)
         root_logger.handlers = []
-        root_logger.addHandler(file_handler)
-        root_logger.addHandler(error_handler)
-        root_logger.addHandler(console_handler)
+        root_logger.addHandler(QueueHandler(log_queue))
         
         # 降低第三方库日志级别
         logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -246,25 +395,19 @@ class WarmBot:
         return logging.getLogger(__name__)
     
     def _init_credential(self) -> Credential:
-        """初始化B站API凭据"""
-        cookies = {}
-        for item in BILIBILI_COOKIE.split(';'):
-            if '=' in item:
-                key, value = item.strip().split('=', 1)
-                cookies[key] = value
-        
+        """初始化B站API凭据（Cookie已在模块导入时解析）"""
         # 保存机器人自己的UID
-        self.bot_uid = cookies.get('DedeUserID')
-        
+        self.bot_uid = _COOKIES.get('DedeUserID')
+
         # 使用构造函数直接创建 Credential
         credential = Credential(
-            sessdata=cookies.get('SESSDATA'),
-            bili_jct=cookies.get('bili_jct'),
-            buvid3=cookies.get('buvid3'),
+            sessdata=_COOKIES.get('SESSDATA'),
+            bili_jct=_COOKIES.get('bili_jct'),
+            buvid3=_COOKIES.get('buvid3'),
             dedeuserid=self.bot_uid,
-            ac_time_value=cookies.get('ac_time_value')
+            ac_time_value=_COOKIES.get('ac_time_value')
         )
-        
+
         return credential
     
     # ========== 主流程 ==========
@@ -276,7 +419,10 @@ class WarmBot:
             return
         
         self.running = True
-        
+
+        # 对话跟进改为事件驱动：调度器睡到最早的next_check_at再检查
+        scheduler_task = asyncio.create_task(self._conversation_scheduler())
+
         while self.running:
             try:
                 await self.run_cycle()
@@ -285,42 +431,155 @@ class WarmBot:
                 interval_minutes = PERFORMANCE_CONFIG.get('scan_interval_minutes', 5)
                 interval = interval_minutes * 60
                 await self._print(f"\n⏳ {interval_minutes}分钟后进入下一周期...")
+                await self._flush_output()
                 
-                # 分段等待，便于快速响应停止信号
-                for _ in range(interval):
-                    if not self.running:
-                        break
-                    await asyncio.sleep(1)
-                    
+                # 等待停止事件，超时即进入下一周期（stop()时立即唤醒）
+                try:
+                    await asyncio.wait_for(self._stop_event.wait(), timeout=interval)
+                except asyncio.TimeoutError:
+                    pass
+
             except Exception as e:
                 self.logger.error(f"运行周期异常: {e}")
                 self._stats['errors'].append(str(e))
                 await asyncio.sleep(60)  # 异常后等待1分钟
-    
+
+        scheduler_task.cancel()
+        try:
+            await scheduler_task
+        except asyncio.CancelledError:
+            pass
+
+    def _schedule_conversation_check(self, next_check_at, conv_id: int = 0):
+        """把对话的下次检查时间推入调度堆并唤醒调度器"""
+        if next_check_at is None:
+            return
+        if isinstance(next_check_at, str):
+            try:
+                next_check_at = datetime.fromisoformat(next_check_at)
+            except ValueError:
+                return
+        heapq.heappush(self._due_heap, (next_check_at, conv_id))
+        self._due_event.set()
+
+    async def _conversation_scheduler(self):
+        """事件驱动的对话跟进调度
+
+        不再每个周期固定轮询SQLite，而是维护 (next_check_at, conv_id)
+        最小堆，睡到最早到期时间才发起检查；新调度会提前唤醒重新评估。
+        空闲时SQL查询次数为零。
+        """
+        # 启动时从数据库恢复待检查时间点
+        try:
+            for conv_id, next_check_at in await self.db.get_scheduled_check_times():
+                self._schedule_conversation_check(next_check_at, conv_id)
+        except Exception as e:
+            self.logger.error(f"加载待检查对话失败: {e}")
+
+        while self.running:
+            try:
+                if not self._due_heap:
+                    await self._due_event.wait()
+                    self._due_event.clear()
+                    continue
+
+                delay = (self._due_heap[0][0] - datetime.now()).total_seconds()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._due_event.wait(), timeout=delay)
+                        self._due_event.clear()
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                # 弹出所有已到期的条目，统一跑一次检查
+                now = datetime.now()
+                while self._due_heap and self._due_heap[0][0] <= now:
+                    heapq.heappop(self._due_heap)
+                # 检查在调度器里运行，子评论请求缓存按批清空，
+                # 不再依赖run_cycle的清理（避免跨批复用旧结果）
+                self._subcomment_cache.clear()
+                await self._check_pending_conversations()
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"对话调度器异常: {e}")
+                await asyncio.sleep(60)
+
     async def run_cycle(self):
         """运行一个完整周期"""
         self._stats['start_time'] = time.time()
+
+        # 清空上一周期的缓存（保证每周期拿到新数据）
+        # 视频摘要/评论区上下文改为按TTL过期，跨周期复用
+        self._subcomment_cache.clear()
         
         await self._print(f"\n{'='*60}")
         await self._print("🚀 温暖陪伴机器人启动")
         await self._print(f"{'='*60}")
         
-        # 1. 检查需要跟进的对话（兜底）- 只检查 replied 状态
-        await self._check_pending_conversations()
-        
-        # 2. 搜索并处理新视频
+        # 对话跟进由_conversation_scheduler按到期时间驱动，不再在周期里轮询
+
+        # 1. 搜索并处理新视频
         await self._process_new_videos()
-        
-        # 3. 打印统计
+
+        # 2. 打印统计
         await self._print_stats()
     
     def stop(self):
         """停止机器人"""
         self.running = False
+        self._stop_event.set()
+        self._due_event.set()  # 唤醒调度器以便退出
         self.logger.info("🛑 收到停止信号")
     
     # ========== 对话处理 ==========
-    
+
+    def _get_fresh_cached_task(self, cache: Dict, key) -> Optional[asyncio.Task]:
+        """取缓存任务：过期或已失败的条目视为未命中"""
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        deadline, task = entry
+        if deadline <= time.monotonic() or \
+                (task.done() and task.exception() is not None):
+            cache.pop(key, None)
+            return None
+        return task
+
+    async def _get_video_content(self, bvid: str) -> Dict:
+        """获取视频内容（按bvid带TTL缓存，跨扫描周期复用；并发调用共享一个提取任务）"""
+        task = self._get_fresh_cached_task(self._video_content_cache, bvid)
+        if task is None:
+            if len(self._video_content_cache) >= self._content_cache_max:
+                # 超出容量时淘汰最早的条目，限制长期运行的内存占用
+                self._video_content_cache.pop(next(iter(self._video_content_cache)))
+            task = asyncio.create_task(self.video_extractor.extract_video_content(bvid))
+            ttl = PERFORMANCE_CONFIG.get('video_summary_ttl_hours', 6) * 3600
+            self._video_content_cache[bvid] = (time.monotonic() + ttl, task)
+        return await task
+
+    async def _get_comments_context(self, bvid: str, max_comments: int) -> str:
+        """获取评论区上下文（带TTL缓存，跨扫描周期复用；并发调用共享一个抓取任务）"""
+        if not self.comment_context_fetcher:
+            return ""
+        key = (bvid, max_comments)
+        task = self._get_fresh_cached_task(self._comments_ctx_cache, key)
+        if task is None:
+            if len(self._comments_ctx_cache) >= self._content_cache_max:
+                self._comments_ctx_cache.pop(next(iter(self._comments_ctx_cache)))
+            task = asyncio.create_task(
+                self.comment_context_fetcher.fetch_video_comments_context(
+                    bvid=bvid,
+                    max_comments=max_comments,
+                    include_replies=True
+                )
+            )
+            ttl = PERFORMANCE_CONFIG.get('comments_context_ttl_minutes', 10) * 60
+            self._comments_ctx_cache[key] = (time.monotonic() + ttl, task)
+        return await task
+
     async def _continue_conversation(self, conv_id: int, bvid: str, root_id: int,
                                     parent_id: int, username: str, content: str,
                                     messages: List[Dict], check_count: int = 0):
@@ -333,24 +592,21 @@ class WarmBot:
         # 获取视频内容摘要（使用完整逻辑：AI总结 -> 字幕 -> 标题+简介）
         video_summary = ""
         try:
-            video_content = await self.video_extractor.extract_video_content(bvid)
+            video_content = await self._get_video_content(bvid)
             if video_content and video_content.get('summary'):
                 video_summary = video_content['summary']
                 source_desc = video_content.get('source_desc', '未知来源')
                 await self._print(f"      📹 已获取视频内容 ({source_desc})")
         except Exception as e:
             self.logger.debug(f"获取视频内容失败: {e}")
-        
+
         comments_context = ""
         try:
-            if self.comment_context_fetcher:
-                comments_context = await self.comment_context_fetcher.fetch_video_comments_context(
-                    bvid=bvid,
-                    max_comments=COMMENT_CONFIG.get('comments_context_count', 50),
-                    include_replies=True
-                )
-                if comments_context:
-                    await self._print(f"      📋 已获取评论区上下文 ({len(comments_context)} 字符)")
+            comments_context = await self._get_comments_context(
+                bvid, COMMENT_CONFIG.get('comments_context_count', 50)
+            )
+            if comments_context:
+                await self._print(f"      📋 已获取评论区上下文 ({len(comments_context)} 字符)")
         except Exception as e:
             self.logger.debug(f"获取评论区上下文失败: {e}")
         
@@ -455,7 +711,31 @@ class WarmBot:
         except Exception as e:
             self.logger.error(f"AI分析失败: {e}")
             return None
-    
+
+    async def _analyze_batch_with_protection(self, video_title: str,
+                                             video_summary: str,
+                                             comments_context: str,
+                                             comments: List[Dict]) -> Optional[List[Dict]]:
+        """
+        在防护下批量分析一个视频的多条评论
+
+        整个视频的候选评论只占一次限流令牌、一次API往返。
+        """
+        try:
+            await deepseek_limiter.acquire()
+
+            return await deepseek_breaker.call(
+                deepseek_retry.execute,
+                self.analyzer.analyze_comments_batch,
+                video_title=video_title,
+                video_summary=video_summary,
+                comments=comments,
+                comments_context=comments_context
+            )
+        except Exception as e:
+            self.logger.error(f"AI批量分析失败: {e}")
+            return None
+
     async def _send_reply_with_protection(self, bvid: str, root_id: int, 
                                          parent_id: int, content: str, conv_id: int,
                                          username: str = "", original_content: str = ""):
@@ -485,10 +765,11 @@ class WarmBot:
                                    content: str, conv_id: int,
                                    username: str = "", original_content: str = ""):
         """内部发送回复方法"""
+        now = datetime.now()
         try:
             # 使用 CommentInteractor 发送回复，支持回复格式
             rpid = await self.comment_interactor.send_reply(
-                oid=bvid2aid(bvid),
+                oid=_bvid2aid(bvid),
                 content=content,
                 root=root_id,
                 parent=parent_id,
@@ -499,24 +780,22 @@ class WarmBot:
             if not rpid:
                 raise Exception("发送回复失败，未获取到评论ID")
             
-            # 记录机器人评论到数据库（用于后续判断是否是回复机器人）
-            await self.db.record_bot_comment(
-                comment_id=rpid,
-                bvid=bvid,
-                root_id=root_id,
-                content=content
-            )
-            
-            # 更新对话状态
-            await self.db.update_conversation_status(
-                conv_id=conv_id,
+            # 单事务写入：机器人评论记录 + 对话状态 + 消息
+            await self.db.apply_conversation_update(
+                conv_id,
+                messages_to_add=[('bot', content, rpid, True)],
                 status='replied',
-                next_check_at=datetime.now() + timedelta(hours=1)
+                next_check_at=now + timedelta(hours=1),
+                bot_comment={
+                    'comment_id': rpid,
+                    'bvid': bvid,
+                    'root_id': root_id,
+                    'content': content
+                }
             )
-            
-            # 记录消息
-            await self.db.add_message(conv_id, 'bot', content, rpid=rpid)
-            
+            self._schedule_conversation_check(now + timedelta(hours=1), conv_id)
+
+
             # 显示回复信息（包含用户名和原评论）
             if username and original_content:
                 await self._print(f"      ✅ 已回复 @{username}: 「{original_content[:30]}...」 → 「{content[:30]}...」")
@@ -541,32 +820,57 @@ class WarmBot:
                 return
             
             await self._print(f"   发现 {len(conversations)} 个对话需要检查")
-            
-            for conv in conversations:
-                await self._check_conversation_updates(conv)
-                await asyncio.sleep(2)
-                
+
+            # 并发检查对话（信号量限制并发数，限流在API调用处统一控制）
+            sem = asyncio.Semaphore(PERFORMANCE_CONFIG.get('conv_check_concurrency', 5))
+
+            async def _run(conv):
+                async with sem:
+                    await self._check_conversation_updates(conv)
+                # 每个对话检查完即冲刷输出，保持日志及时可见
+                await self._flush_output()
+
+            results = await asyncio.gather(
+                *(_run(conv) for conv in conversations),
+                return_exceptions=True
+            )
+
+            for conv, result in zip(conversations, results):
+                if isinstance(result, Exception):
+                    self.logger.error(f"检查对话 {conv['id']} 异常: {result}")
+                    self._stats['errors'].append(f"检查对话 {conv['id']}: {result}")
+
         except Exception as e:
             self.logger.error(f"检查对话失败: {e}")
             self._stats['errors'].append(f"检查对话: {e}")
+        finally:
+            await self._flush_output()
     
+    async def _fetch_sub_comments(self, bvid: str, root_id: int) -> Dict:
+        """获取评论的第一页子评论（限流在此统一控制）"""
+        # 在API边界限流，替代循环中的固定sleep（后台轮询，低优先级）
+        await bilibili_comments_limiter.acquire(priority=5)
+        c = Comment(
+            oid=_bvid2aid(bvid),
+            type_=CommentResourceType.VIDEO,
+            rpid=root_id,
+            credential=self.credential
+        )
+        return await c.get_sub_comments(page_index=1, page_size=20)
+
     async def _check_conversation_updates(self, conv: Dict):
         """检查单个对话的更新"""
         bvid = conv['bvid']
         root_id = conv['root_comment_id']
-        
+        # 本次检查的统一时钟，所有超时/退避计算基于同一时间点
+        now = datetime.now()
+
         try:
             # 1. 检查对话是否已超时（24小时）
             last_reply_time = conv.get('last_reply_at') or conv.get('updated_at') or conv.get('created_at')
             if last_reply_time:
-                if isinstance(last_reply_time, str):
-                    last_reply_time = datetime.fromisoformat(last_reply_time.replace('Z', '+00:00'))
-                    # 如果时间是 naive（无时区），假设为本地时间
-                    if last_reply_time.tzinfo is None:
-                        from datetime import timezone
-                        # 将 UTC 时间转换为本地时间（created_at 存储的是 UTC）
-                        last_reply_time = last_reply_time.replace(tzinfo=timezone.utc).astimezone(tz=None).replace(tzinfo=None)
-                hours_since_last_reply = (datetime.now() - last_reply_time).total_seconds() / 3600
+                last_reply_time = _to_local_naive(last_reply_time)
+                hours_since_last_reply = (now - last_reply_time).total_seconds() / 3600
                 
                 if hours_since_last_reply >= CONVERSATION_CONFIG['conversation_retention_hours']:
                     await self.db.update_conversation_status(
@@ -577,14 +881,21 @@ class WarmBot:
                     await self._print(f"   🔒 对话 {conv['id']}: 超过24小时未回复，已关闭")
                     return
             
-            # 2. 使用 Comment 类获取该评论下的子评论（回复）
-            c = Comment(
-                oid=bvid2aid(bvid),
-                type_=CommentResourceType.VIDEO,
-                rpid=root_id,
-                credential=self.credential
-            )
-            sub_comments_result = await c.get_sub_comments(page_index=1, page_size=20)
+            # 2. 获取该评论下的子评论（回复）
+            # 同周期内同一 (bvid, root_id) 共享一个请求任务，首个等待者触发请求
+            key = (bvid, root_id)
+            task = self._subcomment_cache.get(key)
+            if task is None:
+                task = asyncio.create_task(self._fetch_sub_comments(bvid, root_id))
+                self._subcomment_cache[key] = task
+            try:
+                sub_comments_result = await task
+            except BaseException:
+                # 失败的任务要从缓存剔除，否则同批后续等待者
+                # 会反复收到这个旧异常
+                if self._subcomment_cache.get(key) is task:
+                    del self._subcomment_cache[key]
+                raise
             
             # 3. 解析子评论，检查是否有用户的新回复
             sub_replies = (sub_comments_result.get('replies') or []) if isinstance(sub_comments_result, dict) else []
@@ -595,6 +906,9 @@ class WarmBot:
                 existing_messages = []
             # 统一转为字符串进行比较，避免 int/str 类型不匹配
             existing_rpics = {str(msg.get('rpid')) for msg in existing_messages if msg.get('rpid')}
+
+            # 按rpid索引子评论，避免循环内再做线性查找
+            sub_by_rpid = {str(reply.get('rpid')): reply for reply in sub_replies if reply.get('rpid')}
             
             # 获取机器人最后一条回复的rpid，用于判断用户是否回复了机器人
             bot_messages = [msg for msg in existing_messages if msg.get('role') == 'bot' and msg.get('rpid')]
@@ -602,33 +916,29 @@ class WarmBot:
             
             # 零宽空格标记，用于区分AI回复和人工回复
             ZWSP = "\u200B"
-            
+
+            # 对话历史中是否有过AI回复（优先读写入时的is_ai标记，
+            # 旧数据没有标记时退回零宽空格扫描）
+            has_ai_reply = any(
+                msg.get('is_ai') or ZWSP in (msg.get('content') or '')
+                for msg in existing_messages
+                if msg.get('role') == 'bot'
+            )
+
             # 找出用户的新回复（只处理直接回复机器人的）
             new_user_replies = []
             for reply in sub_replies:
-                rpid = reply.get('rpid')
-                rpid_str = str(rpid) if rpid else None
+                rpid_str, user_mid_str, reply_username, parent_id_raw, reply_content = _unpack_reply(reply)
                 if rpid_str and rpid_str not in existing_rpics:
-                    user_mid = (reply.get('member') or {}).get('mid')
-                    user_mid_str = str(user_mid) if user_mid else None
-                    
                     # 排除机器人自己的回复
-                    if user_mid_str and self.bot_uid and user_mid_str == str(self.bot_uid):
-                        reply_content = (reply.get('content') or {}).get('message', '')
-                        
+                    if user_mid_str and self._bot_uid_str and user_mid_str == self._bot_uid_str:
                         # 检查是否包含零宽空格标记
                         if ZWSP in reply_content:
                             # AI自动回复，记录并继续监控
-                            await self.db.add_message(conv['id'], 'bot', reply_content, rpid=rpid_str)
+                            await self.db.add_message(conv['id'], 'bot', reply_content,
+                                                      rpid=rpid_str, is_ai=True)
                         else:
                             # 人工回复（无零宽空格标记）
-                            # 检查对话历史中是否有过AI回复
-                            has_ai_reply = any(
-                                ZWSP in (msg.get('content', '') or '') 
-                                for msg in existing_messages 
-                                if msg.get('role') == 'bot'
-                            )
-                            
                             if has_ai_reply:
                                 # AI参与过的对话，人工干预后暂停
                                 await self.db.update_conversation_status(
@@ -649,13 +959,11 @@ class WarmBot:
                     
                     # 只处理目标用户直接回复机器人的评论
                     if user_mid_str and user_mid_str == str(conv.get('user_mid')):
-                        parent_id_raw = reply.get('parent', 0)
-                        # 提前获取用户名用于日志
-                        reply_username = (reply.get('member') or {}).get('uname', '用户')
                         # 检查是否直接回复机器人的最后一条消息
                         if last_bot_rpid and str(parent_id_raw) == last_bot_rpid:
                             new_user_replies.append({
-                                'reply': reply,
+                                'username': reply_username,
+                                'content': reply_content,
                                 'rpid_str': rpid_str,
                                 'parent_id': int(parent_id_raw) if parent_id_raw else root_id
                             })
@@ -666,11 +974,10 @@ class WarmBot:
             
             if new_user_replies:
                 latest_item = new_user_replies[-1]
-                latest_reply = latest_item['reply']
                 rpid_str = latest_item['rpid_str']
                 parent_id = latest_item['parent_id']
-                username = (latest_reply.get('member') or {}).get('uname', '用户')
-                content = (latest_reply.get('content') or {}).get('message', '')
+                username = latest_item['username']
+                content = latest_item['content']
                 
                 # 检查对话状态，如果是paused且用户有新回复，判断回复对象
                 current_status = conv.get('status', '')
@@ -679,42 +986,53 @@ class WarmBot:
                     user_reply_parent_id = str(parent_id)
                     replied_to_bot = False
                     
-                    # 在子评论中查找被回复的消息
-                    for reply in sub_replies:
-                        if str(reply.get('rpid')) == user_reply_parent_id:
-                            parent_content = (reply.get('content') or {}).get('message', '')
-                            # 检查被回复的消息是否包含零宽空格（AI发的）
-                            if ZWSP in parent_content:
-                                replied_to_bot = True
-                            break
+                    # 在子评论索引中查找被回复的消息
+                    parent_reply = sub_by_rpid.get(user_reply_parent_id)
+                    if parent_reply:
+                        parent_content = (parent_reply.get('content') or {}).get('message', '')
+                        # 检查被回复的消息是否包含零宽空格（AI发的）
+                        if ZWSP in parent_content:
+                            replied_to_bot = True
                     
                     if replied_to_bot:
-                        # 用户回复的是AI消息，重新激活
+                        # 用户回复的是AI消息，重新激活；
+                        # 顺手挂上兜底检查时间，后续发送失败也能被再次调度
                         await self._print(f"   🔄 对话 {conv['id']}: 暂停状态检测到用户回复AI，重新激活")
+                        retry_at = now + timedelta(
+                            minutes=CONVERSATION_CONFIG['backoff_base_minutes'])
                         await self.db.update_conversation_status(
                             conv_id=conv['id'],
-                            status='replied'
+                            status='replied',
+                            next_check_at=retry_at
                         )
+                        self._schedule_conversation_check(retry_at, conv['id'])
                     else:
                         # 用户回复的是人工消息，保持暂停
                         await self._print(f"   ⏸️ 对话 {conv['id']}: 用户回复人工消息，保持暂停")
-                        # 记录用户回复但不激活AI
-                        await self.db.add_message(conv['id'], 'user', content, rpid=rpid_str)
-                        # 更新检查次数和下次检查时间
+                        # 记录用户回复但不激活AI，连同检查次数和下次检查时间一并写入
                         check_count = conv.get('check_count', 0) + 1
                         paused_config = CONVERSATION_CONFIG['paused_config']
                         next_interval = paused_config['check_interval_minutes']
-                        next_check_at = datetime.now() + timedelta(minutes=next_interval)
-                        await self.db.update_conversation_status(
-                            conv_id=conv['id'],
+                        next_check_at = now + timedelta(minutes=next_interval)
+                        await self.db.apply_conversation_update(
+                            conv['id'],
+                            messages_to_add=[('user', content, rpid_str)],
                             status='paused',
                             next_check_at=next_check_at,
                             check_count=check_count
                         )
+                        self._schedule_conversation_check(next_check_at, conv['id'])
                         return
                 
                 await self._print(f"   💬 对话 {conv['id']}: 收到 {len(new_user_replies)} 条新回复")
-                
+
+                # 兜底重调度：生成/发送失败不抛出异常，先入堆一个重试点，
+                # 成功路径会另行写入更晚的下次检查时间
+                self._schedule_conversation_check(
+                    now + timedelta(minutes=CONVERSATION_CONFIG['backoff_base_minutes']),
+                    conv['id']
+                )
+
                 await self.db.add_message(conv['id'], 'user', content, rpid=rpid_str)
                 
                 messages = await self.db.get_conversation_messages(conv['id'])
@@ -749,7 +1067,7 @@ class WarmBot:
                 
                 # 暂停状态使用固定间隔（6小时）
                 next_interval = paused_config['check_interval_minutes']
-                next_check_at = datetime.now() + timedelta(minutes=next_interval)
+                next_check_at = now + timedelta(minutes=next_interval)
                 
                 await self.db.update_conversation_status(
                     conv_id=conv['id'],
@@ -757,6 +1075,7 @@ class WarmBot:
                     next_check_at=next_check_at,
                     check_count=check_count
                 )
+                self._schedule_conversation_check(next_check_at, conv['id'])
                 await self._print(f"   ⏳ 对话 {conv['id']}: 暂停状态无新回复，{next_interval}分钟后再次检查(第{check_count}次)")
             else:
                 # replied状态使用原有逻辑
@@ -777,7 +1096,7 @@ class WarmBot:
                 max_interval = CONVERSATION_CONFIG['max_check_interval_minutes']
                 next_interval = min(next_interval, max_interval)
                 
-                next_check_at = datetime.now() + timedelta(minutes=next_interval)
+                next_check_at = now + timedelta(minutes=next_interval)
                 
                 await self.db.update_conversation_status(
                     conv_id=conv['id'],
@@ -785,17 +1104,21 @@ class WarmBot:
                     next_check_at=next_check_at,
                     check_count=check_count
                 )
+                self._schedule_conversation_check(next_check_at, conv['id'])
                 await self._print(f"   ⏳ 对话 {conv['id']}: 无新回复，{next_interval}分钟后再次检查(第{check_count}次)")
             
         except Exception as e:
-            error_msg = str(e)
+            # bilibili_api的ResponseCodeException带有.code属性，
+            # 优先精确匹配错误码，仅在属性缺失时才退回字符串扫描
+            code = getattr(e, 'code', None)
+            error_msg = '' if code is not None else str(e)
             # 检查是否是评论已被删除的错误 (12022)
-            if '12022' in error_msg or '已经被删除' in error_msg:
+            if code == 12022 or '12022' in error_msg or '已经被删除' in error_msg:
                 self.logger.warning(f"对话 {conv['id']} 的根评论已被删除，关闭对话")
                 await self.db.close_conversation(conv['id'])
                 await self._print(f"   🗑️ 对话 {conv['id']}: 原评论已被删除，已关闭")
             # 检查是否是评论功能已关闭的错误 (12002)
-            elif '12002' in error_msg or '评论功能已关闭' in error_msg:
+            elif code == 12002 or '12002' in error_msg or '评论功能已关闭' in error_msg:
                 self.logger.warning(f"对话 {conv['id']} 的视频评论功能已关闭，关闭对话")
                 await self.db.update_conversation_status(
                     conv_id=conv['id'],
@@ -807,6 +1130,13 @@ class WarmBot:
                 import traceback
                 self.logger.error(f"检查对话 {conv['id']} 失败: {e}")
                 self.logger.error(f"堆栈: {traceback.format_exc()}")
+                # 瞬时失败（风控/网络抖动）必须重新入堆，否则该对话
+                # 在进程重启前不会再被调度；库里的next_check_at已是过去
+                # 时间，重启恢复时同样会把它捞回来，无需额外落库
+                self._schedule_conversation_check(
+                    now + timedelta(minutes=CONVERSATION_CONFIG['backoff_base_minutes']),
+                    conv['id']
+                )
     
     # ========== 第三层：新视频处理 ==========
     
@@ -824,18 +1154,38 @@ class WarmBot:
             
             await self._print(f"   发现 {len(videos)} 个新视频")
             
-            for video_info in videos[:SEARCH_CONFIG.get('max_videos_per_scan', 5)]:
-                await self._process_video(video_info)
-                await asyncio.sleep(3)
-                
+            batch = videos[:SEARCH_CONFIG.get('max_videos_per_scan', 5)]
+
+            # 本次扫描的视频一次性入库（单事务），不再每个视频单独提交
+            await self.db.track_videos_bulk(
+                [(v['bvid'], v['title'], 0) for v in batch]
+            )
+
+            # 有限并发处理：各视频的网络/AI等待相互重叠，
+            # 调用频率仍由各端点限流器兜底，无需额外sleep
+            semaphore = asyncio.Semaphore(
+                PERFORMANCE_CONFIG.get('video_concurrency', 3)
+            )
+
+            async def process_one(video_info: Dict):
+                async with semaphore:
+                    await self._process_video(video_info)
+
+            await asyncio.gather(
+                *[process_one(v) for v in batch],
+                return_exceptions=True
+            )
+
         except Exception as e:
             self.logger.error(f"处理新视频失败: {e}")
             self._stats['errors'].append(f"处理新视频: {e}")
+        finally:
+            await self._flush_output()
     
     async def _search_with_protection(self) -> List[Dict]:
         """在防护下搜索视频"""
         try:
-            await bilibili_limiter.acquire()
+            await bilibili_search_limiter.acquire()
             
             return await bilibili_breaker.call(
                 bilibili_retry.execute,
@@ -856,15 +1206,14 @@ class WarmBot:
         
         await self._print(f"\n📺 [{bvid}] {title[:50]}...")
         
-        # 追踪视频（搜索阶段已过滤已处理视频，这里直接记录）
-        await self.db.track_video(bvid, title)
-        
-        # 获取评论
+        # 视频已在_process_new_videos里批量入库，这里只在拿到评论数后更新
+
+        # 获取评论（下游会产生用户可见的回复，优先于后台轮询）
         try:
-            await bilibili_limiter.acquire()
-            
+            await bilibili_comments_limiter.acquire(priority=2)
+
             comments_data = await comment.get_comments(
-                oid=bvid2aid(bvid),
+                oid=_bvid2aid(bvid),
                 type_=CommentResourceType.VIDEO,
                 order=OrderType.TIME,
                 credential=self.credential
@@ -887,65 +1236,102 @@ class WarmBot:
             
             await self._print(f"   获取到 {len(replies)} 条根评论 (总评论数: {total_comments})")
             
-            # 处理评论
-            processed = 0
+            # 先做去重筛选（只探测存在性），剩余候选评论打包成一次AI请求
+            candidates = []
             for cmt in replies[:COMMENT_CONFIG.get('max_replies_per_video', 5)]:
-                if await self._process_comment(bvid, title, cmt):
-                    processed += 1
-                    await asyncio.sleep(2)
-            
+                if not await self.db.conversation_exists_by_root(bvid, cmt['rpid']):
+                    candidates.append(cmt)
+
+            processed = 0
+            if candidates:
+                # 视频摘要与评论区上下文每个视频只获取一次，
+                # 两者相互独立，并发执行取较慢者的耗时
+                video_content, ctx_result = await asyncio.gather(
+                    self._get_video_content(bvid),
+                    self._get_comments_context(
+                        bvid, COMMENT_CONFIG.get('comments_context_count', 30)
+                    ),
+                    return_exceptions=True
+                )
+
+                video_summary = ""
+                if isinstance(video_content, Exception):
+                    self.logger.debug(f"获取视频内容失败: {video_content}")
+                elif video_content and video_content.get('summary'):
+                    video_summary = video_content['summary']
+
+                comments_context = ""
+                if isinstance(ctx_result, Exception):
+                    self.logger.debug(f"获取评论区上下文失败: {ctx_result}")
+                else:
+                    comments_context = ctx_result or ""
+
+                analyses = await self._analyze_batch_with_protection(
+                    video_title=title,
+                    video_summary=video_summary,
+                    comments_context=comments_context,
+                    comments=[
+                        {
+                            "username": c['member']['uname'],
+                            "content": c['content']['message']
+                        }
+                        for c in candidates
+                    ]
+                )
+
+                # 整批候选评论本地扫一次紧急关键词（AI分析失败时的兜底依据）
+                local_flags = contains_emergency_keywords_batch(
+                    [c['content']['message'] for c in candidates]
+                )
+
+                # 整批分析失败(None)时仍逐条走处理：本地紧急兜底和
+                # ignored去重记录都依赖 _handle_comment_analysis 执行
+                if analyses is None:
+                    analyses = [None] * len(candidates)
+
+                for cmt, result, local_emg in zip(candidates, analyses, local_flags):
+                    if await self._handle_comment_analysis(bvid, title, cmt, result, local_emg):
+                        processed += 1
+
             await self._print(f"   处理了 {processed} 条需要回复的评论")
             self._stats['videos_processed'] += 1
             
         except Exception as e:
             self.logger.error(f"处理视频 {bvid} 失败: {e}")
+        finally:
+            await self._flush_output()
     
-    async def _process_comment(self, bvid: str, title: str, cmt: Dict) -> bool:
-        """处理单条评论，返回是否已回复（带评论区上下文）"""
+    async def _handle_comment_analysis(self, bvid: str, title: str,
+                                       cmt: Dict, result: Optional[Dict],
+                                       local_emergency: bool = False) -> bool:
+        """根据AI分析结果处理单条评论，返回是否已回复
+
+        local_emergency: 本地紧急关键词批量扫描的结果，
+        在AI分析不可用时作为记录紧急日志的兜底依据
+        """
         try:
             username = cmt['member']['uname']
             content = cmt['content']['message']
             comment_id = cmt['rpid']
-            
-            # 检查是否已回复（通过对话记录判断）
-            existing_conv = await self.db.get_conversation_by_root(bvid, comment_id)
-            if existing_conv:
-                return False
-            
-            # 获取视频内容摘要（使用完整逻辑）
-            video_summary = ""
-            try:
-                video_content = await self.video_extractor.extract_video_content(bvid)
-                if video_content and video_content.get('summary'):
-                    video_summary = video_content['summary']
-            except Exception as e:
-                self.logger.debug(f"获取视频内容失败: {e}")
-            
-            # 获取评论区上下文（实时爬取）
-            comments_context = ""
-            try:
-                if self.comment_context_fetcher:
-                    comments_context = await self.comment_context_fetcher.fetch_video_comments_context(
-                        bvid=bvid,
-                        max_comments=COMMENT_CONFIG.get('comments_context_count', 30),
-                        include_replies=True
-                    )
-            except Exception as e:
-                self.logger.debug(f"获取评论区上下文失败: {e}")
-                comments_context = ""
-            
-            # AI分析
-            result = await self._analyze_with_protection(
-                video_title=title,
-                video_summary=video_summary,
-                comment_username=username,
-                comment_content=content,
-                is_emergency=False,
-                comments_context=comments_context
-            )
-            
+
+            if isinstance(result, Exception):
+                result = None
+
+            # AI分析失败时的本地兜底：批量关键词扫描的结果，避免漏记紧急评论
+            if result is None and local_emergency:
+                await self._log_emergency(
+                    bvid=bvid,
+                    title=title,
+                    username=username,
+                    user_mid=cmt['member']['mid'],
+                    content=content,
+                    reply='',
+                    emotion='未知',
+                    sentiment_score=0.0
+                )
+
             # 硬编码检查：情感分数必须>=0.55才回复（双保险机制）
-            sentiment_score = result.get('sentiment_score', 0)
+            sentiment_score = result.get('sentiment_score', 0) if result else 0
             if not result or not result.get('needs_comfort') or not result.get('reply') or sentiment_score < 0.55:
                 # AI判断不需要安慰，或分数不达标，标记为ignored，避免重复处理
                 await self.db.create_conversation(
@@ -1006,63 +1392,47 @@ class WarmBot:
     async def _log_emergency(self, bvid: str, title: str, username: str, 
                             user_mid: int, content: str, reply: str,
                             emotion: str, sentiment_score: float):
-        """记录紧急情况到文件"""
+        """记录紧急情况到文件（入队攒批，由后台任务统一写盘）"""
         try:
-            from datetime import datetime
-            
-            log_content = f"""
-================================================================================
-🚨 紧急情况记录 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-================================================================================
-
-📺 视频信息:
-   标题: {title}
-   BV号: {bvid}
-   链接: https://www.bilibili.com/video/{bvid}
-
-👤 用户信息:
-   用户名: {username}
-   UID: {user_mid}
-   主页: https://space.bilibili.com/{user_mid}
-
-💬 用户评论:
-   {content}
-
-🤖 我的回复:
-   {reply}
-
-📊 情感分析:
-   情感类型: {emotion}
-   情感分数: {sentiment_score:.2f} (越负越严重)
-
-⚠️  建议操作:
-   1. 点击用户主页查看其近期动态
-   2. 关注该用户是否有后续回复
-   3. 如有必要，考虑私信关心（但避免说教）
-   4. 记录处理时间和方式
+            log_content = _EMERGENCY_TEMPLATE.format(
+                time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                title=title,
+                bvid=bvid,
+                username=username,
+                user_mid=user_mid,
+                content=content,
+                reply=reply,
+                emotion=emotion,
+                sentiment_score=sentiment_score
+            )
+            self._emergency_queue.append(log_content)
 
-================================================================================
+            # 惰性启动冲刷任务：并发到达的紧急情况合并成一次写入
+            if self._emergency_flush_task is None or self._emergency_flush_task.done():
+                self._emergency_flush_task = asyncio.create_task(
+                    self._flush_emergency_queue()
+                )
 
-"""
-            # 使用线程池执行文件写入（避免阻塞事件循环）
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None, 
-                self._write_emergency_log, 
-                log_content
-            )
-            
             self.logger.warning(f"🚨 紧急情况已记录: {username} - {bvid}")
-            
+
         except Exception as e:
             self.logger.error(f"记录紧急情况失败: {e}")
-    
-    def _write_emergency_log(self, content: str):
-        """同步写入紧急情况日志"""
+
+    async def _flush_emergency_queue(self):
+        """短暂等待攒批后，把队列中的紧急记录一次性写盘"""
+        await asyncio.sleep(1)
+        if not self._emergency_queue:
+            return
+        batch, self._emergency_queue = self._emergency_queue, []
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(None, self._write_emergency_log, batch)
+
+    def _write_emergency_log(self, contents: List[str]):
+        """同步写入紧急情况日志（一批一次打开+写入）"""
         try:
             EMERGENCY_LOG.parent.mkdir(parents=True, exist_ok=True)
             with open(EMERGENCY_LOG, 'a', encoding='utf-8') as f:
-                f.write(content)
+                f.writelines(contents)
         except Exception as e:
             self.logger.error(f"写入紧急情况日志失败: {e}")
     
@@ -1095,5 +1465,9 @@ class WarmBot:
             'replies_sent': 0,
             'api_calls': 0,
             'start_time': None,
-            'errors': []
+            'errors': collections.deque(
+                maxlen=PERFORMANCE_CONFIG.get('error_ring_size', 500)
+            )
         }
+
+        await self._flush_output()
@@ -4,6 +4,7 @@
 核心表：
 1. tracked_videos - 追踪的视频
 2. conversations - 对话记录
+3. conversation_messages - 对话消息（一行一条）
 
 状态：
 - new: 新建，尚未回复
@@ -14,22 +15,95 @@
 
 import sqlite3
 import asyncio
+import time
 import aiosqlite
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Set
 from contextlib import asynccontextmanager
 from config import DATABASE_PATH
 
 
+# 热路径SQL模板：模块级定义一次，sqlite3的语句缓存按SQL文本命中，
+# 常量字符串避免每次调用重新构造/重新解析
+
+# 对话查询只取需要的列，不再拖回legacy的messages大字段
+_CONV_COLUMNS = ("id, bvid, root_comment_id, user_mid, username, status, "
+                 "last_reply_at, next_check_at, check_count, close_reason, "
+                 "created_at, updated_at")
+_SQL_SELECT_CONV_BY_ID = f"SELECT {_CONV_COLUMNS} FROM conversations WHERE id = ?"
+_SQL_SELECT_CONV_BY_ROOT = (
+    f"SELECT {_CONV_COLUMNS} FROM conversations WHERE bvid = ? AND root_comment_id = ?"
+)
+_SQL_EXISTS_CONV_BY_ROOT = (
+    "SELECT 1 FROM conversations WHERE bvid = ? AND root_comment_id = ? LIMIT 1"
+)
+_SQL_SELECT_DUE_CONVS = f"""SELECT {_CONV_COLUMNS} FROM conversations
+                   WHERE status IN ('replied', 'paused')
+                   AND next_check_at <= datetime('now', 'localtime')"""
+_SQL_SELECT_MESSAGES = (
+    "SELECT * FROM conversation_messages WHERE conv_id = ? ORDER BY id"
+)
+_SQL_INSERT_MESSAGE = """INSERT INTO conversation_messages
+                   (conv_id, role, content, rpid, is_ai, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?)"""
+_SQL_TOUCH_CONV = "UPDATE conversations SET updated_at = ? WHERE id = ?"
+_SQL_INSERT_BOT_COMMENT = """INSERT OR REPLACE INTO bot_comments
+                   (comment_id, bvid, root_id, content, created_at)
+                   VALUES (?, ?, ?, ?, ?)"""
+
+
 class DatabaseManager:
     """数据库管理器"""
     
     def __init__(self, db_path: Path = DATABASE_PATH):
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # 长连接：启动时打开一次，避免每次调用重建连接和journal
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        # 按对话加锁，防止并发检查时同一行上的事务交叠
+        self._conv_locks: Dict[int, asyncio.Lock] = {}
+        # 已建对话的 (bvid, root_comment_id) 集合：
+        # 扫描去重时绝大多数查询是未命中，用内存集合直接短路掉SQL往返
+        self._conv_root_cache: set = set()
+        self._conv_root_cache_loaded = False
+        # 对话统计缓存：(monotonic时间, 结果)，统计不要求实时
+        self._stats_cache: Optional[tuple] = None
         self._init_database_sync()
+
+    async def connect(self) -> aiosqlite.Connection:
+        """打开长连接并设置WAL等PRAGMA（幂等）"""
+        if self._conn is None:
+            conn = await aiosqlite.connect(self.db_path)
+            conn.row_factory = aiosqlite.Row
+            # WAL + NORMAL大幅降低写路径的fsync开销
+            await conn.execute("PRAGMA journal_mode=WAL")
+            await conn.execute("PRAGMA synchronous=NORMAL")
+            await conn.execute("PRAGMA temp_store=MEMORY")
+            await conn.execute("PRAGMA mmap_size=268435456")
+            self._conn = conn
+            await self._load_root_cache()
+        return self._conn
+
+    async def _load_root_cache(self):
+        """启动时一次性加载已建对话的根评论ID集合"""
+        cursor = await self._conn.execute(
+            "SELECT bvid, root_comment_id FROM conversations"
+        )
+        rows = await cursor.fetchall()
+        self._conv_root_cache = {
+            (row['bvid'], row['root_comment_id']) for row in rows
+        }
+        self._conv_root_cache_loaded = True
+
+    def _get_conv_lock(self, conv_id: int) -> asyncio.Lock:
+        """获取对话级别的锁（按需创建）"""
+        lock = self._conv_locks.get(conv_id)
+        if lock is None:
+            lock = self._conv_locks.setdefault(conv_id, asyncio.Lock())
+        return lock
     
     def _init_database_sync(self):
         """同步初始化数据库"""
@@ -71,6 +145,16 @@ class DatabaseManager:
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversations_status ON conversations(status)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversations_next_check ON conversations(next_check_at)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversations_user ON conversations(user_mid)")
+            # 部分索引：轮询查询只扫到期的replied/paused行，不再全表过滤
+            cursor.execute(
+                """CREATE INDEX IF NOT EXISTS idx_conv_replied_due
+                   ON conversations(next_check_at)
+                   WHERE status IN ('replied', 'paused')"""
+            )
+            # 复合索引：每条候选评论的去重查询走单次索引探测
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conv_bvid_root ON conversations(bvid, root_comment_id)"
+            )
             
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS bot_comments (
@@ -82,30 +166,74 @@ class DatabaseManager:
                 )
             """)
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_bot_comments_bvid ON bot_comments(bvid)")
-            
+
+            # 消息表：一行一条消息，追加是O(1)插入，
+            # 不再每次重写整个messages JSON
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conv_id INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT,
+                    rpid TEXT,
+                    is_ai INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conv_messages_conv ON conversation_messages(conv_id, id)"
+            )
+
             # 数据库迁移：为已存在的表添加新字段
             try:
                 cursor.execute("ALTER TABLE conversations ADD COLUMN close_reason TEXT")
             except sqlite3.OperationalError:
                 pass  # 字段已存在，忽略
-            
+
+            # 一次性迁移：把旧的messages JSON数组拆成消息行
+            cursor.execute("SELECT COUNT(*) FROM conversation_messages")
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(
+                    "SELECT id, messages FROM conversations WHERE messages IS NOT NULL AND messages != '[]'"
+                )
+                for conv_id, blob in cursor.fetchall():
+                    try:
+                        old_messages = json.loads(blob) or []
+                    except (TypeError, ValueError):
+                        continue
+                    for msg in old_messages:
+                        cursor.execute(
+                            """INSERT INTO conversation_messages
+                               (conv_id, role, content, rpid, is_ai, created_at)
+                               VALUES (?, ?, ?, ?, ?, ?)""",
+                            (conv_id, msg.get('role'), msg.get('content'),
+                             str(msg['rpid']) if msg.get('rpid') is not None else None,
+                             1 if msg.get('is_ai') else None,
+                             msg.get('time') or datetime.now())
+                        )
+
             conn.commit()
     
     @asynccontextmanager
     async def get_connection(self):
-        """获取数据库连接"""
-        conn = await aiosqlite.connect(self.db_path)
-        try:
-            conn.row_factory = aiosqlite.Row
-            yield conn
-        finally:
-            await conn.close()
+        """获取数据库连接（共享长连接，调用方不要close）"""
+        if self._conn is None:
+            await self.connect()
+        yield self._conn
+
+    @asynccontextmanager
+    async def get_write_connection(self):
+        """获取写连接：持写锁串行化，防止并发任务的事务交叠"""
+        async with self._write_lock:
+            if self._conn is None:
+                await self.connect()
+            yield self._conn
     
     # ========== 视频追踪相关 ==========
     
     async def track_video(self, bvid: str, title: str, total_comments: int = 0) -> bool:
         """追踪新视频"""
-        async with self.get_connection() as conn:
+        async with self.get_write_connection() as conn:
             await conn.execute(
                 """INSERT OR REPLACE INTO tracked_videos 
                    (bvid, title, total_comments, last_check_at, status)
@@ -115,6 +243,28 @@ class DatabaseManager:
             await conn.commit()
             return True
     
+    async def track_videos_bulk(self, rows: List[tuple]) -> int:
+        """批量追踪视频：一次executemany、一次提交
+
+        Args:
+            rows: (bvid, title, total_comments) 元组列表
+
+        一次扫描发现的所有视频合并进同一个事务，fsync从每视频一次降为每扫描一次。
+        """
+        if not rows:
+            return 0
+        now = datetime.now()
+        async with self.get_write_connection() as conn:
+            await conn.executemany(
+                """INSERT OR REPLACE INTO tracked_videos
+                   (bvid, title, total_comments, last_check_at, status)
+                   VALUES (?, ?, ?, ?, 'active')""",
+                [(bvid, title, total_comments, now)
+                 for bvid, title, total_comments in rows]
+            )
+            await conn.commit()
+            return len(rows)
+
     async def get_tracked_video(self, bvid: str) -> Optional[Dict]:
         """获取追踪的视频信息"""
         async with self.get_connection() as conn:
@@ -125,6 +275,26 @@ class DatabaseManager:
             row = await cursor.fetchone()
             return dict(row) if row else None
     
+    async def get_tracked_videos_bulk(self, bvids: List[str]) -> Set[str]:
+        """批量查询哪些bvid已被追踪：一条IN查询替代逐个往返
+
+        Args:
+            bvids: 候选bvid列表
+
+        Returns:
+            已在tracked_videos中的bvid集合
+        """
+        if not bvids:
+            return set()
+        placeholders = ",".join("?" * len(bvids))
+        async with self.get_connection() as conn:
+            cursor = await conn.execute(
+                f"SELECT bvid FROM tracked_videos WHERE bvid IN ({placeholders})",
+                bvids
+            )
+            rows = await cursor.fetchall()
+            return {row[0] for row in rows}
+
     async def get_active_videos(self) -> List[Dict]:
         """获取所有活跃的视频"""
         async with self.get_connection() as conn:
@@ -136,7 +306,7 @@ class DatabaseManager:
     
     async def update_video_comment_count(self, bvid: str, count: int):
         """更新视频评论数"""
-        async with self.get_connection() as conn:
+        async with self.get_write_connection() as conn:
             await conn.execute(
                 "UPDATE tracked_videos SET total_comments = ? WHERE bvid = ?",
                 (count, bvid)
@@ -144,145 +314,185 @@ class DatabaseManager:
             await conn.commit()
     
     # ========== 对话相关 ==========
-    
+
+    @staticmethod
+    def _message_row_to_dict(row) -> Dict:
+        """消息行转为历史上messages JSON里的字典结构（保持调用方兼容）"""
+        msg = {
+            "role": row['role'],
+            "content": row['content'],
+            "time": row['created_at']
+        }
+        if row['rpid'] is not None:
+            msg["rpid"] = row['rpid']
+        if row['is_ai'] is not None:
+            msg["is_ai"] = bool(row['is_ai'])
+        return msg
+
+    async def _load_messages(self, conn, conv_ids: List[int]) -> Dict[int, List[Dict]]:
+        """批量加载多个对话的消息，按conv_id分组"""
+        if not conv_ids:
+            return {}
+        placeholders = ','.join('?' * len(conv_ids))
+        cursor = await conn.execute(
+            f"""SELECT * FROM conversation_messages
+                WHERE conv_id IN ({placeholders})
+                ORDER BY conv_id, id""",
+            conv_ids
+        )
+        rows = await cursor.fetchall()
+        grouped: Dict[int, List[Dict]] = {conv_id: [] for conv_id in conv_ids}
+        for row in rows:
+            grouped[row['conv_id']].append(self._message_row_to_dict(row))
+        return grouped
+
     async def create_conversation(self, bvid: str, root_comment_id: int,
                                    user_mid: int, username: str,
                                    first_message: str, status: str = 'new',
                                    next_check_at: datetime = None) -> int:
         """创建新对话（支持指定初始状态）"""
-        messages = [{
-            "role": "user",
-            "content": first_message,
-            "time": datetime.now().isoformat(),
-            "rpid": root_comment_id  # 记录根评论ID，用于后续去重
-        }]
-        
+        now = datetime.now()
+
         # 如果没有指定 next_check_at，根据状态自动设置
         if next_check_at is None and status == 'replied':
-            next_check_at = datetime.now() + timedelta(hours=1)
-        
-        async with self.get_connection() as conn:
+            next_check_at = now + timedelta(hours=1)
+
+        async with self.get_write_connection() as conn:
             cursor = await conn.execute(
-                """INSERT INTO conversations 
-                   (bvid, root_comment_id, user_mid, username, messages, 
+                """INSERT INTO conversations
+                   (bvid, root_comment_id, user_mid, username,
                     status, last_reply_at, next_check_at, updated_at)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (bvid, root_comment_id, user_mid, username, json.dumps(messages, ensure_ascii=False),
-                 status, datetime.now(), next_check_at, datetime.now())
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (bvid, root_comment_id, user_mid, username,
+                 status, now, next_check_at, now)
+            )
+            conv_id = cursor.lastrowid
+            # 首条用户消息，rpid记录根评论ID用于后续去重
+            await conn.execute(
+                """INSERT INTO conversation_messages
+                   (conv_id, role, content, rpid, created_at)
+                   VALUES (?, 'user', ?, ?, ?)""",
+                (conv_id, first_message, str(root_comment_id), now)
             )
             await conn.commit()
-            return cursor.lastrowid
+            self._conv_root_cache.add((bvid, root_comment_id))
+            return conv_id
     
     async def get_conversation(self, conv_id: int) -> Optional[Dict]:
         """获取对话"""
         async with self.get_connection() as conn:
-            cursor = await conn.execute(
-                "SELECT * FROM conversations WHERE id = ?",
-                (conv_id,)
-            )
+            cursor = await conn.execute(_SQL_SELECT_CONV_BY_ID, (conv_id,))
             row = await cursor.fetchone()
             if row:
                 data = dict(row)
-                messages_json = data['messages']
-                parsed = json.loads(messages_json) if messages_json else []
-                data['messages'] = parsed if parsed is not None else []
+                grouped = await self._load_messages(conn, [data['id']])
+                data['messages'] = grouped.get(data['id'], [])
                 return data
             return None
     
+    async def conversation_exists_by_root(self, bvid: str, root_comment_id: int) -> bool:
+        """判断根评论是否已有对话（去重专用，只探测存在性）"""
+        if self._conv_root_cache_loaded:
+            return (bvid, root_comment_id) in self._conv_root_cache
+        async with self.get_connection() as conn:
+            cursor = await conn.execute(
+                _SQL_EXISTS_CONV_BY_ROOT, (bvid, root_comment_id)
+            )
+            return await cursor.fetchone() is not None
+
     async def get_conversation_by_root(self, bvid: str, root_comment_id: int) -> Optional[Dict]:
         """通过根评论ID获取对话"""
+        # 负向查询短路：缓存里没有就一定不存在，省掉一次SQL往返
+        if self._conv_root_cache_loaded and \
+                (bvid, root_comment_id) not in self._conv_root_cache:
+            return None
         async with self.get_connection() as conn:
             cursor = await conn.execute(
-                "SELECT * FROM conversations WHERE bvid = ? AND root_comment_id = ?",
-                (bvid, root_comment_id)
+                _SQL_SELECT_CONV_BY_ROOT, (bvid, root_comment_id)
             )
             row = await cursor.fetchone()
             if row:
                 data = dict(row)
-                messages_json = data['messages']
-                parsed = json.loads(messages_json) if messages_json else []
-                data['messages'] = parsed if parsed is not None else []
+                grouped = await self._load_messages(conn, [data['id']])
+                data['messages'] = grouped.get(data['id'], [])
                 return data
             return None
-    
+
     async def get_conversations_by_status(self, status: str) -> List[Dict]:
         """获取指定状态的对话"""
         async with self.get_connection() as conn:
             cursor = await conn.execute(
-                "SELECT * FROM conversations WHERE status = ?",
+                f"SELECT {_CONV_COLUMNS} FROM conversations WHERE status = ?",
                 (status,)
             )
             rows = await cursor.fetchall()
-            result = []
-            for row in rows:
-                data = dict(row)
-                messages_json = data['messages']
-                parsed = json.loads(messages_json) if messages_json else []
-                data['messages'] = parsed if parsed is not None else []
-                result.append(data)
+            result = [dict(row) for row in rows]
+            grouped = await self._load_messages(conn, [r['id'] for r in result])
+            for data in result:
+                data['messages'] = grouped.get(data['id'], [])
             return result
-    
+
+    async def get_scheduled_check_times(self) -> List[tuple]:
+        """获取所有待跟进对话的 (id, next_check_at)，用于启动时恢复调度堆"""
+        async with self.get_connection() as conn:
+            cursor = await conn.execute(
+                """SELECT id, next_check_at FROM conversations
+                   WHERE status IN ('replied', 'paused')
+                   AND next_check_at IS NOT NULL"""
+            )
+            rows = await cursor.fetchall()
+            return [(row['id'], row['next_check_at']) for row in rows]
+
     async def get_replied_conversations_to_check(self) -> List[Dict]:
         """获取需要检查的已回复对话（包括replied和paused状态，next_check_at到期）"""
         async with self.get_connection() as conn:
             # 使用 datetime('now', 'localtime') 确保使用本地时间进行比较
-            cursor = await conn.execute(
-                """SELECT * FROM conversations 
-                   WHERE status IN ('replied', 'paused') 
-                   AND next_check_at <= datetime('now', 'localtime')"""
-            )
+            cursor = await conn.execute(_SQL_SELECT_DUE_CONVS)
             rows = await cursor.fetchall()
-            result = []
-            for row in rows:
-                data = dict(row)
-                messages_json = data['messages']
-                parsed = json.loads(messages_json) if messages_json else []
-                data['messages'] = parsed if parsed is not None else []
-                result.append(data)
+            result = [dict(row) for row in rows]
+            grouped = await self._load_messages(conn, [r['id'] for r in result])
+            for data in result:
+                data['messages'] = grouped.get(data['id'], [])
             return result
     
-    async def add_message(self, conv_id: int, role: str, content: str, rpid = None):
-        """添加消息到对话"""
-        conv = await self.get_conversation(conv_id)
-        if not conv:
-            return False
-        
-        messages = conv.get('messages') or []
-        message_data = {
-            "role": role,
-            "content": content,
-            "time": datetime.now().isoformat()
-        }
-        if rpid is not None:
-            message_data["rpid"] = str(rpid)  # 统一转为字符串存储
-        messages.append(message_data)
-        
-        async with self.get_connection() as conn:
+    async def add_message(self, conv_id: int, role: str, content: str, rpid = None,
+                          is_ai: bool = None):
+        """添加消息到对话
+
+        is_ai: 机器人消息是否为AI自动回复。写入时标记一次，
+        读取方就不用再扫描内容里的零宽空格。
+        """
+        now = datetime.now()
+        async with self.get_write_connection() as conn:
+            # 行级追加：O(1)插入，不再重写整个消息历史
             await conn.execute(
-                """UPDATE conversations 
-                   SET messages = ?, updated_at = ? 
-                   WHERE id = ?""",
-                (json.dumps(messages, ensure_ascii=False), datetime.now(), conv_id)
+                _SQL_INSERT_MESSAGE,
+                (conv_id, role, content,
+                 str(rpid) if rpid is not None else None,  # 统一转为字符串存储
+                 None if is_ai is None else int(is_ai),
+                 now)
             )
+            cursor = await conn.execute(_SQL_TOUCH_CONV, (now, conv_id))
             await conn.commit()
-            return True
-    
+            return cursor.rowcount > 0
+
     async def get_conversation_messages(self, conv_id: int) -> List[Dict]:
         """获取对话的所有消息"""
-        conv = await self.get_conversation(conv_id)
-        if not conv:
-            return []
-        return conv.get('messages') or []
+        async with self.get_connection() as conn:
+            cursor = await conn.execute(_SQL_SELECT_MESSAGES, (conv_id,))
+            rows = await cursor.fetchall()
+            return [self._message_row_to_dict(row) for row in rows]
     
     async def update_conversation_status(self, conv_id: int, status: str, 
                                          next_check_at: datetime = None,
                                          check_count: int = None,
                                          close_reason: str = None):
         """更新对话状态"""
-        async with self.get_connection() as conn:
+        now = datetime.now()
+        async with self.get_write_connection() as conn:
             # 构建动态更新语句
             fields = ["status = ?", "updated_at = ?"]
-            values = [status, datetime.now()]
+            values = [status, now]
             
             if next_check_at is not None:
                 fields.append("next_check_at = ?")
@@ -306,39 +516,105 @@ class DatabaseManager:
             await conn.commit()
             return True
     
+    async def apply_conversation_update(self, conv_id: int, *,
+                                        messages_to_add: List[tuple] = None,
+                                        status: str = None,
+                                        last_reply_at: datetime = None,
+                                        next_check_at: datetime = None,
+                                        check_count: int = None,
+                                        close_reason: str = None,
+                                        bot_comment: Dict = None) -> bool:
+        """
+        在单个事务中应用对话的全部变更
+
+        把原本分散的 add_message / update_conversation_status /
+        record_bot_comment 多次往返合并为一次连接、一次提交。
+
+        Args:
+            messages_to_add: 待追加的消息列表，元素为 (role, content, rpid[, is_ai])
+            status: 新状态（可选）
+            last_reply_at/next_check_at/check_count/close_reason: 状态字段（可选）
+            bot_comment: 机器人评论记录 {comment_id, bvid, root_id, content}（可选）
+        """
+        now = datetime.now()
+        async with self._get_conv_lock(conv_id):
+            async with self.get_write_connection() as conn:
+                fields = ["updated_at = ?"]
+                values = [now]
+
+                if messages_to_add:
+                    message_rows = []
+                    for item in messages_to_add:
+                        # 兼容 (role, content, rpid) 和 (role, content, rpid, is_ai)
+                        role, content, rpid = item[0], item[1], item[2]
+                        is_ai = item[3] if len(item) > 3 else None
+                        message_rows.append((
+                            conv_id, role, content,
+                            str(rpid) if rpid is not None else None,
+                            None if is_ai is None else int(is_ai),
+                            now
+                        ))
+                    await conn.executemany(_SQL_INSERT_MESSAGE, message_rows)
+
+                if status is not None:
+                    fields.append("status = ?")
+                    values.append(status)
+                if last_reply_at is not None:
+                    fields.append("last_reply_at = ?")
+                    values.append(last_reply_at)
+                if next_check_at is not None:
+                    fields.append("next_check_at = ?")
+                    values.append(next_check_at)
+                if check_count is not None:
+                    fields.append("check_count = ?")
+                    values.append(check_count)
+                if close_reason is not None:
+                    fields.append("close_reason = ?")
+                    values.append(close_reason)
+
+                values.append(conv_id)
+                await conn.execute(
+                    f"UPDATE conversations SET {', '.join(fields)} WHERE id = ?",
+                    values
+                )
+
+                if bot_comment is not None:
+                    await conn.execute(
+                        _SQL_INSERT_BOT_COMMENT,
+                        (bot_comment['comment_id'], bot_comment['bvid'],
+                         bot_comment['root_id'], bot_comment['content'], now)
+                    )
+
+                await conn.commit()
+                return True
+
     async def update_conversation_after_reply(self, conv_id: int, reply_content: str):
         """回复后更新对话状态（状态变为 replied）"""
-        conv = await self.get_conversation(conv_id)
-        if not conv:
-            return False
-        
-        messages = conv['messages']
-        messages.append({
-            "role": "bot",
-            "content": reply_content,
-            "time": datetime.now().isoformat()
-        })
-        
-        check_count = conv['check_count'] + 1
-        # 检查次数超过5次，关闭对话
-        status = 'closed' if check_count >= 5 else 'replied'
-        
-        async with self.get_connection() as conn:
+        now = datetime.now()
+        async with self.get_write_connection() as conn:
+            # 消息插入+状态流转在同一事务内：check_count在SQL端自增，
+            # 达到5次直接关闭，无需先SELECT
             await conn.execute(
-                """UPDATE conversations 
-                   SET messages = ?, 
-                       status = ?,
+                """INSERT INTO conversation_messages
+                   (conv_id, role, content, created_at)
+                   VALUES (?, 'bot', ?, ?)""",
+                (conv_id, reply_content, now)
+            )
+            cursor = await conn.execute(
+                """UPDATE conversations
+                   SET status = CASE WHEN check_count + 1 >= 5
+                                     THEN 'closed' ELSE 'replied' END,
                        last_reply_at = ?,
                        next_check_at = ?,
-                       check_count = ?,
+                       check_count = check_count + 1,
                        updated_at = ?
                    WHERE id = ?""",
-                (json.dumps(messages, ensure_ascii=False), status, datetime.now(),
-                 datetime.now() + timedelta(hours=2), check_count, 
-                 datetime.now(), conv_id)
+                (now,
+                 now + timedelta(hours=2),
+                 now, conv_id)
             )
             await conn.commit()
-            return True
+            return cursor.rowcount > 0
     
     async def increment_check_count(self, conv_id: int) -> bool:
         """增加检查次数，超过5次则关闭"""
@@ -348,22 +624,23 @@ class DatabaseManager:
         
         check_count = conv['check_count'] + 1
         status = 'closed' if check_count >= 5 else conv['status']
-        
-        async with self.get_connection() as conn:
+
+        now = datetime.now()
+        async with self.get_write_connection() as conn:
             await conn.execute(
                 """UPDATE conversations 
                    SET check_count = ?, status = ?, next_check_at = ?, updated_at = ?
                    WHERE id = ?""",
-                (check_count, status, 
-                 datetime.now() + timedelta(hours=2),
-                 datetime.now(), conv_id)
+                (check_count, status,
+                 now + timedelta(hours=2),
+                 now, conv_id)
             )
             await conn.commit()
             return True
     
     async def close_conversation(self, conv_id: int):
         """关闭对话"""
-        async with self.get_connection() as conn:
+        async with self.get_write_connection() as conn:
             await conn.execute(
                 """UPDATE conversations 
                    SET status = 'closed', updated_at = ? 
@@ -374,7 +651,7 @@ class DatabaseManager:
     
     async def ignore_conversation(self, conv_id: int):
         """标记对话为忽略（非目标对话）"""
-        async with self.get_connection() as conn:
+        async with self.get_write_connection() as conn:
             await conn.execute(
                 """UPDATE conversations 
                    SET status = 'ignored', updated_at = ? 
@@ -387,15 +664,29 @@ class DatabaseManager:
     
     async def record_bot_comment(self, comment_id: int, bvid: str, root_id: int, content: str):
         """记录机器人发送的评论"""
-        async with self.get_connection() as conn:
+        async with self.get_write_connection() as conn:
             await conn.execute(
-                """INSERT OR REPLACE INTO bot_comments 
+                _SQL_INSERT_BOT_COMMENT,
+                (comment_id, bvid, root_id, content, datetime.now())
+            )
+            await conn.commit()
+
+    async def record_bot_comments_bulk(self, rows: List[tuple]) -> int:
+        """批量记录机器人评论：(comment_id, bvid, root_id, content) 元组列表"""
+        if not rows:
+            return 0
+        now = datetime.now()
+        async with self.get_write_connection() as conn:
+            await conn.executemany(
+                """INSERT OR REPLACE INTO bot_comments
                    (comment_id, bvid, root_id, content, created_at)
                    VALUES (?, ?, ?, ?, ?)""",
-                (comment_id, bvid, root_id, content, datetime.now())
+                [(comment_id, bvid, root_id, content, now)
+                 for comment_id, bvid, root_id, content in rows]
             )
             await conn.commit()
-    
+            return len(rows)
+
     async def is_bot_comment(self, comment_id: int) -> bool:
         """检查某条评论是否是机器人发送的"""
         async with self.get_connection() as conn:
@@ -421,18 +712,30 @@ class DatabaseManager:
     # ========== 统计相关 ==========
     
     async def get_conversation_stats(self) -> Dict:
-        """获取对话统计"""
+        """获取对话统计（30秒内重复调用直接返回缓存）"""
+        if self._stats_cache is not None:
+            cached_at, cached = self._stats_cache
+            if time.monotonic() - cached_at < 30:
+                return dict(cached)
+
         async with self.get_connection() as conn:
+            # 条件求和：一次走status索引的聚合，替代全表GROUP BY
             cursor = await conn.execute(
-                """SELECT status, COUNT(*) as count 
-                   FROM conversations 
-                   GROUP BY status"""
+                """SELECT
+                       SUM(status = 'new') AS new,
+                       SUM(status = 'replied') AS replied,
+                       SUM(status = 'paused') AS paused,
+                       SUM(status = 'ignored') AS ignored,
+                       SUM(status = 'closed') AS closed
+                   FROM conversations"""
             )
-            rows = await cursor.fetchall()
-            return {row['status']: row['count'] for row in rows}
+            row = await cursor.fetchone()
+            stats = {key: row[key] or 0 for key in row.keys()}
+            self._stats_cache = (time.monotonic(), stats)
+            return dict(stats)
     
     async def close(self):
-        """关闭数据库连接池"""
-        # aiosqlite使用上下文管理器，这里不需要额外操作
-        # 但为了API一致性，保留此方法
-        pass
+        """关闭长连接"""
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
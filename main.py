@@ -14,6 +14,7 @@
 """
 
 import asyncio
+import os
 import signal
 import sys
 from pathlib import Path
@@ -22,6 +23,8 @@ from typing import Optional
 # 添加项目路径到 Python 路径，确保模块导入正常
 sys.path.insert(0, str(Path(__file__).parent))
 
+from bilibili_api import select_client
+
 from core import WarmBot
 
 
@@ -39,16 +42,25 @@ class Application:
     def __init__(self):
         self.bot: Optional[WarmBot] = None
         self.shutdown_event = asyncio.Event()
-        self._setup_signal_handlers()
-    
+
     def _setup_signal_handlers(self):
-        """设置信号处理器"""
+        """设置信号处理器（需在事件循环内调用）
+
+        POSIX上用 loop.add_signal_handler：回调在事件循环线程内执行，
+        set() 不存在跨线程竞态；Windows事件循环不支持该接口，
+        退回 signal.signal。
+        """
+        loop = asyncio.get_running_loop()
         # Windows支持SIGINT，Unix还支持SIGTERM
-        signal.signal(signal.SIGINT, self._signal_handler)
-        if hasattr(signal, 'SIGTERM'):
-            signal.signal(signal.SIGTERM, self._signal_handler)
-    
-    def _signal_handler(self, signum, frame):
+        for sig in (signal.SIGINT, getattr(signal, 'SIGTERM', None)):
+            if sig is None:
+                continue
+            try:
+                loop.add_signal_handler(sig, self._on_signal, sig)
+            except NotImplementedError:
+                signal.signal(sig, lambda signum, frame: self._on_signal(signum))
+
+    def _on_signal(self, signum):
         """信号处理回调"""
         print(f"\n\n收到信号 {signum}，正在优雅关闭...")
         self.shutdown_event.set()
@@ -62,7 +74,19 @@ class Application:
         """
         try:
             print("🔧 正在初始化...")
-            
+
+            # 在事件循环内注册信号处理器
+            self._setup_signal_handlers()
+
+            # bilibili-api 17.x 每个事件循环维护一个带连接池的HTTP客户端，
+            # 所有 search/comment/video 调用复用同一批 keep-alive 连接。
+            # 显式固定为 httpx 后端（requirements 锁定的依赖），
+            # 避免按安装环境自动选择导致连接复用行为不确定
+            try:
+                select_client("httpx")
+            except Exception:
+                pass  # 后端已选定或不可用时，沿用库的自动选择
+
             # 创建机器人实例
             self.bot = WarmBot()
             
@@ -99,14 +123,11 @@ class Application:
             return_when=asyncio.FIRST_COMPLETED
         )
         
-        # 取消剩余任务
+        # 取消剩余任务并等待它们真正退出，避免 "Task was destroyed but it is pending"
         for task in pending:
             task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
-        
+        await asyncio.gather(*pending, return_exceptions=True)
+
         # 优雅关闭
         await self.shutdown()
     
@@ -156,14 +177,20 @@ async def main():
 
 
 if __name__ == "__main__":
-    # Windows 平台事件循环策略配置
-    # 解决 Windows 上 asyncio 的默认事件循环限制
-    if sys.platform == "win32":
+    # Windows 默认使用 ProactorEventLoop（IOCP），HTTP I/O 扩展性优于 Selector 循环，
+    # httpx 在其上工作正常。仅在个别依赖确实需要 Selector 时通过环境变量显式退回
+    if sys.platform == "win32" and os.environ.get("WARMBOT_FORCE_SELECTOR"):
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     
     # 启动异步主循环
     try:
-        asyncio.run(main())
+        if hasattr(asyncio, "Runner"):
+            # Python 3.11+：Runner 统一管理循环生命周期，
+            # 复用同一个循环且关闭路径更确定（取消的任务会被真正等到退出）
+            with asyncio.Runner() as runner:
+                runner.run(main())
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         # 这个异常通常被信号处理器处理，这里是最后一道防线
         print("\n\n程序被中断")
@@ -10,12 +10,18 @@
 """
 
 import asyncio
-from datetime import datetime
+import logging
+import time
 from typing import List, Dict, Optional
-from bilibili_api import comment, video
+from bilibili_api import comment
 from bilibili_api.comment import CommentResourceType, OrderType
-from bilibili_api.utils.network import Credential
 from bilibili_api.utils.aid_bvid_transformer import bvid2aid
+from bilibili_api.utils.network import Credential
+
+logger = logging.getLogger(__name__)
+
+# 解析评论时的空字典占位，避免每条回复分配临时 {}
+_EMPTY: Dict = {}
 
 
 class CommentContextFetcher:
@@ -23,6 +29,8 @@ class CommentContextFetcher:
     
     def __init__(self, credential: Credential):
         self.credential = credential
+        # 子评论并发上限：并行拉取楼中楼，但限制同时在途请求数避免触发风控
+        self._sub_fetch_sem = asyncio.Semaphore(5)
     
     async def fetch_video_comments_context(
         self, 
@@ -42,31 +50,24 @@ class CommentContextFetcher:
             格式化后的评论区文本
         """
         try:
-            # 获取视频信息
-            v = video.Video(bvid=bvid, credential=self.credential)
-            video_info = await v.get_info()
-            title = video_info.get('title', '未知标题')
-            
+            # BV号→AID是纯本地换算，省掉一次get_info的HTTP往返
+            aid = bvid2aid(bvid)
+
             # 获取评论
             comments_data = await self._fetch_comments(
-                aid=v.get_aid(), 
+                aid=aid,
                 max_comments=max_comments,
                 include_replies=include_replies
             )
-            
+
             if not comments_data:
                 return ""
-            
+
             # 格式化为文本
-            formatted_context = self._format_comments_to_text(
-                title=title,
-                comments=comments_data
-            )
-            
-            return formatted_context
+            return self._format_comments_to_text(comments_data)
             
         except Exception as e:
-            print(f"获取评论区上下文失败 BV{bvid}: {e}")
+            logger.warning(f"获取评论区上下文失败 BV{bvid}: {e}")
             return ""
     
     async def _fetch_comments(
@@ -100,25 +101,37 @@ class CommentContextFetcher:
                 if not replies:
                     break
                 
-                # 处理每条评论
+                # 先解析本页父评论，记下需要拉楼中楼的楼层
+                page_comments = []  # [(父评论数据, 子评论任务下标或None)]
+                sub_coros = []
                 for reply in replies:
-                    if len(all_comments) >= max_comments:
+                    if len(all_comments) + len(page_comments) >= max_comments:
                         break
-                    
-                    # 添加父评论
+
                     comment_data = self._parse_comment(reply)
+                    sub_index = None
+
+                    # 获取子评论（楼中楼）：各楼层相互独立，并行拉取重叠网络延迟
+                    if include_replies and reply.get('rcount', 0) > 0:
+                        sub_index = len(sub_coros)
+                        sub_coros.append(self._fetch_sub_comments(
+                            aid=aid,
+                            parent_rpid=reply['rpid'],
+                            parent_username=comment_data['username'] if comment_data else None
+                        ))
+
+                    page_comments.append((comment_data, sub_index))
+
+                # 并发执行本页所有子评论拉取（信号量控制在途数量）
+                sub_results = await asyncio.gather(*sub_coros, return_exceptions=True) if sub_coros else []
+
+                # 按楼层顺序组装：父评论后紧跟其楼中楼
+                for comment_data, sub_index in page_comments:
                     if comment_data:
                         all_comments.append(comment_data)
-                    
-                    # 获取子评论（楼中楼）
-                    if include_replies:
-                        rcount = reply.get('rcount', 0)
-                        if rcount > 0:
-                            sub_comments = await self._fetch_sub_comments(
-                                aid=aid,
-                                parent_rpid=reply['rpid'],
-                                parent_username=comment_data['username'] if comment_data else None
-                            )
+                    if sub_index is not None:
+                        sub_comments = sub_results[sub_index]
+                        if isinstance(sub_comments, list):
                             all_comments.extend(sub_comments)
                 
                 # 更新偏移量
@@ -136,7 +149,7 @@ class CommentContextFetcher:
             return all_comments[:max_comments]
             
         except Exception as e:
-            print(f"获取评论失败: {e}")
+            logger.warning(f"获取评论失败: {e}")
             return all_comments
     
     async def _fetch_sub_comments(
@@ -147,7 +160,7 @@ class CommentContextFetcher:
     ) -> List[Dict]:
         """获取子评论（楼中楼）"""
         sub_comments = []
-        
+
         try:
             # 创建Comment对象
             cmt = comment.Comment(
@@ -156,50 +169,51 @@ class CommentContextFetcher:
                 rpid=parent_rpid,
                 credential=self.credential
             )
-            
+
             page_index = 1
             max_sub_pages = 3  # 限制子评论页数
-            
+
             while page_index <= max_sub_pages:
-                result = await cmt.get_sub_comments(
-                    page_index=page_index, 
-                    page_size=20
-                )
-                
+                # 用信号量限制并发在途请求数，替代逐条 sleep 的串行节流
+                async with self._sub_fetch_sem:
+                    result = await cmt.get_sub_comments(
+                        page_index=page_index,
+                        page_size=20
+                    )
+
                 if not isinstance(result, dict):
                     break
-                
+
                 replies = result.get('replies', [])
                 if not replies:
                     break
-                
+
                 for sub_reply in replies:
                     sub_comment_data = self._parse_sub_comment(
-                        sub_reply, 
+                        sub_reply,
                         parent_rpid=parent_rpid,
                         parent_username=parent_username
                     )
                     if sub_comment_data:
                         sub_comments.append(sub_comment_data)
-                
+
                 if len(replies) < 20:
                     break
-                
+
                 page_index += 1
-                await asyncio.sleep(0.3)
-            
+
             return sub_comments
             
         except Exception as e:
-            print(f"获取子评论失败 rpid={parent_rpid}: {e}")
+            logger.warning(f"获取子评论失败 rpid={parent_rpid}: {e}")
             return sub_comments
     
     def _parse_comment(self, reply: Dict) -> Optional[Dict]:
         """解析父评论"""
         try:
-            member = reply.get('member', {})
-            content = reply.get('content', {})
-            
+            member = reply.get('member') or _EMPTY
+            content = reply.get('content') or _EMPTY
+
             return {
                 'rpid': reply.get('rpid'),
                 'username': member.get('uname', '未知用户'),
@@ -219,9 +233,9 @@ class CommentContextFetcher:
     ) -> Optional[Dict]:
         """解析子评论（楼中楼）"""
         try:
-            member = reply.get('member', {})
-            content = reply.get('content', {})
-            
+            member = reply.get('member') or _EMPTY
+            content = reply.get('content') or _EMPTY
+
             # 检查是否是回复某个用户
             message = content.get('message', '')
             
@@ -236,7 +250,7 @@ class CommentContextFetcher:
         except Exception as e:
             return None
     
-    def _format_comments_to_text(self, title: str, comments: List[Dict]) -> str:
+    def _format_comments_to_text(self, comments: List[Dict]) -> str:
         """
         将评论数据格式化为文本
         
@@ -248,26 +262,21 @@ class CommentContextFetcher:
         if not comments:
             return ""
 
-        lines = []
-        
-        for cmt in comments:
-            username = cmt['username']
-            ctime = cmt['ctime']
-            message = cmt['message']
-            is_sub = cmt['is_sub']
-            parent_username = cmt.get('parent_username')
-            
-            # 格式化时间
-            time_str = datetime.fromtimestamp(ctime).strftime('%Y-%m-%d %H:%M:%S')
-            
-            # 格式化评论
-            if is_sub and parent_username:
-                # 子评论显示回复关系
-                line = f"{username} {time_str} 回复 @{parent_username} :{message}"
-            else:
-                # 父评论
-                line = f"{username} {time_str} {message}"
-            
-            lines.append(line)
-        
-        return "\n".join(lines)
+        def _lines():
+            for cmt in comments:
+                username = cmt['username']
+                message = cmt['message']
+                parent_username = cmt.get('parent_username')
+
+                # 格式化时间（time.strftime是纯C调用，省去每行构造datetime对象）
+                time_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(cmt['ctime']))
+
+                if cmt['is_sub'] and parent_username:
+                    # 子评论显示回复关系
+                    yield f"{username} {time_str} 回复 @{parent_username} :{message}"
+                else:
+                    # 父评论
+                    yield f"{username} {time_str} {message}"
+
+        # 逐行生成后直接join，不保留整份中间列表
+        return "\n".join(_lines())
@@ -10,16 +10,51 @@ Bilibili 评论互动模块
 
 import asyncio
 import logging
+import math
 import random
+import re
+from collections import Counter, OrderedDict
+from operator import itemgetter
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from bilibili_api import search, comment, video
+from typing import AsyncIterator, List, Dict, Optional
+from bilibili_api import search, comment
 from bilibili_api.search import SearchObjectType, OrderVideo
 from bilibili_api.comment import CommentResourceType, OrderType
+from bilibili_api.utils.aid_bvid_transformer import bvid2aid
 from bilibili_api.utils.network import Credential
 
+from utils.rate_limiter import AdaptiveDelay, bilibili_comments_limiter
+from utils.retry_handler import bilibili_retry
+
 logger = logging.getLogger(__name__)
 
+# 搜索结果标题里的高亮标签，一次正则替换剥掉（兼容属性变化的<em>变体）
+_EM_TAG_RE = re.compile(r'</?em[^>]*>')
+
+# 解析回复时的空字典占位，避免每条回复分配临时 {}
+_EMPTY: Dict = {}
+
+# 评论发送错误码表：模块级构建一次，日志函数预解析
+_COMMENT_ERROR_HANDLERS = {
+    12002: ("评论已被删除", logger.warning),
+    12022: ("评论不存在或已被删除", logger.warning),
+    12051: ("评论内容重复", logger.warning),
+    12053: ("评论审核中", logger.info),
+    12061: ("评论已关闭", logger.warning),
+    -101: ("账号未登录", logger.error),
+    -400: ("请求错误", logger.error),
+    -403: ("权限不足", logger.warning),
+    -500: ("服务器错误", logger.error),
+}
+
+# 评论发送异常消息模式（匹配小写后的错误信息）
+_COMMENT_EXCEPTION_PATTERNS = (
+    ("412", "被风控", logger.warning),
+    ("-401", "登录失效", logger.error),
+    ("-403", "操作过于频繁", logger.warning),
+    ("timeout", "请求超时", logger.warning),
+)
+
 
 class CommentList(list):
     """评论列表，携带总评论数"""
@@ -36,10 +71,28 @@ class CommentList(list):
 class CommentInteractor:
     """Bilibili 评论交互器"""
     
+    # 已见bvid缓存上限：长期运行时按LRU淘汰最老的记录
+    SEEN_BVIDS_MAX = 50000
+
     def __init__(self, credential: Credential, db_manager=None):
         self.credential = credential
         self.db = db_manager
-        self.seen_bvids = set()
+        # 进程内去重热缓存（有界LRU）；持久去重的真实来源是数据库tracked_videos
+        self.seen_bvids: OrderedDict = OrderedDict()
+        # 最近一次评论拉取解析出的总评论数（由 iter_video_comments 更新）
+        self.last_comments_total = 0
+        # 关键词级搜索并发上限（每个关键词内部还有页级并发）
+        self._keyword_sem = asyncio.Semaphore(3)
+        # 自适应退避：健康时不等待，只在被风控后插入延迟
+        self._search_delay = AdaptiveDelay("search_keyword")
+        self._comments_delay = AdaptiveDelay("comment_pages", min_delay=1.0, max_delay=4.0)
+
+    def _mark_seen(self, bvid: str):
+        """记录已见bvid，超过上限时淘汰最久未见的"""
+        self.seen_bvids[bvid] = None
+        self.seen_bvids.move_to_end(bvid)
+        if len(self.seen_bvids) > self.SEEN_BVIDS_MAX:
+            self.seen_bvids.popitem(last=False)
     
     async def search_negative_videos(self, keywords: Dict[str, List[str]], 
                                      max_results: int = 20,
@@ -47,282 +100,431 @@ class CommentInteractor:
                                      scene_priority: Dict = None) -> List[Dict]:
         """搜索负面情感视频"""
         videos = []
-        scene_videos_count = {}
+        # Counter缺键取0，统计更新只做一次哈希查找
+        scene_videos_count = Counter()
         
         if not scene_priority:
             return await self._search_random(keywords, max_results, time_range_days)
         
-        print(f"\n搜索: {max_results}个视频 | {time_range_days}天内\n")
-        
-        # 第一轮：确保每个场景都有最小视频数
-        for priority_name, scenes in [
-            ("high", scene_priority.get("high", [])),
-            ("medium", scene_priority.get("medium", [])),
-            ("low", scene_priority.get("low", []))
-        ]:
-            for scene in scenes:
-                if scene not in keywords or len(videos) >= max_results:
-                    break
-                
-                current_count = scene_videos_count.get(scene, 0)
-                if current_count >= 3:
-                    continue
-                
-                needed = min(3 - current_count, max_results - len(videos))
-                if needed <= 0:
-                    continue
-                
-                scene_keywords = keywords[scene][:20]
-                scene_videos = await self._search_scene_simple(
-                    scene, scene_keywords, time_range_days, needed
-                )
-                videos.extend(scene_videos)
-                scene_videos_count[scene] = scene_videos_count.get(scene, 0) + len(scene_videos)
-        
-        # 第二轮：继续填充直到达到总数
-        if len(videos) < max_results:
-            for priority_name, scenes in [
-                ("high", scene_priority.get("high", [])),
-                ("medium", scene_priority.get("medium", [])),
-                ("low", scene_priority.get("low", []))
-            ]:
+        logger.info(f"搜索: {max_results}个视频 | {time_range_days}天内")
+
+        # 搜索时间窗口整次调用只计算一次，所有场景/关键词/页共用
+        now = datetime.now()
+        time_start = (now - timedelta(days=time_range_days)).strftime('%Y-%m-%d')
+        time_end = now.strftime('%Y-%m-%d')
+
+        # 每个场景的前20个关键词只切片一次，冻结成元组供两轮填充复用
+        kw20 = {scene: tuple(words[:20]) for scene, words in keywords.items()}
+
+        # 优先级遍历顺序只构建一次，两轮填充共用
+        priority_items = (
+            ("high", scene_priority.get("high", ())),
+            ("medium", scene_priority.get("medium", ())),
+            ("low", scene_priority.get("low", ()))
+        )
+
+        async def _fill(cap_per_scene: int):
+            """按优先级填充视频，每个场景最多 cap_per_scene 个"""
+            for priority_name, scenes in priority_items:
                 if len(videos) >= max_results:
                     break
-                
+
                 for scene in scenes:
-                    if scene not in keywords or len(videos) >= max_results:
+                    if scene not in kw20 or len(videos) >= max_results:
                         break
-                    
-                    current_count = scene_videos_count.get(scene, 0)
-                    if current_count >= 20:
+
+                    current_count = scene_videos_count[scene]
+                    if current_count >= cap_per_scene:
                         continue
-                    
-                    needed = min(20 - current_count, max_results - len(videos))
+
+                    needed = min(cap_per_scene - current_count, max_results - len(videos))
                     if needed <= 0:
                         continue
-                    
-                    scene_keywords = keywords[scene][:20]
+
                     scene_videos = await self._search_scene_simple(
-                        scene, scene_keywords, time_range_days, needed
+                        scene, kw20[scene], time_start, time_end, needed
                     )
                     videos.extend(scene_videos)
-                    scene_videos_count[scene] = scene_videos_count.get(scene, 0) + len(scene_videos)
-        
-        # 打印统计
+                    scene_videos_count[scene] += len(scene_videos)
+
+        # 两轮填充只差每场景的饱和阈值：
+        # 第一轮(3)保证每个场景都有最小视频数，第二轮(20)继续填满总数
+        for cap_per_scene in (3, 20):
+            if len(videos) >= max_results:
+                break
+            await _fill(cap_per_scene)
+
+        # 打印统计（先滤掉零命中的场景再排序，itemgetter是C实现的key函数）
         if scene_videos_count:
-            results = [f"{s}:{c}" for s, c in sorted(scene_videos_count.items(), key=lambda x: -x[1]) if c > 0]
-            print(f"\n结果: {', '.join(results)} | 共{len(videos)}个\n")
+            hits = [(s, c) for s, c in scene_videos_count.items() if c > 0]
+            hits.sort(key=itemgetter(1), reverse=True)
+            results = [f"{s}:{c}" for s, c in hits]
+            logger.info(f"结果: {', '.join(results)} | 共{len(videos)}个")
         
         return videos
     
-    async def _search_scene_simple(self, scene_name: str, keywords: List[str], 
-                                    time_range_days: int, max_needed: int) -> List[Dict]:
-        """搜索单个场景"""
+    async def _search_scene_simple(self, scene_name: str, keywords: List[str],
+                                    time_start: str, time_end: str,
+                                    max_needed: int) -> List[Dict]:
+        """搜索单个场景：各关键词并发搜索（信号量限流），拿够数量即取消剩余"""
+        return await self._gather_keywords(
+            [(scene_name, kw) for kw in keywords], time_start, time_end, max_needed
+        )
+
+    async def _gather_keywords(self, pairs: List[tuple],
+                               time_start: str, time_end: str,
+                               max_needed: int) -> List[Dict]:
+        """并发执行一组 (场景, 关键词) 搜索，按完成顺序收集结果
+
+        关键词之间I/O相互独立，并发后总耗时≈最慢的一个关键词，
+        而不是所有关键词耗时之和。
+        """
         videos = []
-        
-        for keyword in keywords:
-            if len(videos) >= max_needed:
-                break
-            
-            try:
-                keyword_videos = await self._search_keyword(
-                    keyword, scene_name, time_range_days, max_needed - len(videos)
-                )
+
+        async def _one(category: str, kw: str):
+            async with self._keyword_sem:
+                return await self._search_keyword(kw, category, time_start, time_end, max_needed)
+
+        tasks = [asyncio.create_task(_one(category, kw)) for category, kw in pairs]
+
+        try:
+            for fut in asyncio.as_completed(tasks):
+                try:
+                    keyword_videos = await fut
+                except Exception:
+                    continue
+
                 videos.extend(keyword_videos)
-                await asyncio.sleep(0.3)
-            except Exception as e:
-                error_msg = str(e)
-                if "412" in error_msg:
-                    logger.warning(f"搜索请求被风控(412): {error_msg[:50]}")
-                elif "-401" in error_msg:
-                    logger.error(f"登录失效(-401): {error_msg[:50]}")
-                continue
-        
-        return videos
+                if len(videos) >= max_needed:
+                    break
+        finally:
+            # 拿够了就取消还没开始/未完成的关键词搜索
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return videos[:max_needed]
     
-    async def _search_keyword(self, keyword: str, category: str, 
-                              time_range_days: int, max_needed: int) -> List[Dict]:
-        """搜索单个关键词，实时去重，已处理的视频会继续搜索下一页"""
+    async def _search_keyword(self, keyword: str, category: str,
+                              time_start: str, time_end: str,
+                              max_needed: int) -> List[Dict]:
+        """搜索单个关键词，实时去重，已处理的视频会继续搜索下一页
+
+        各页并发预取（信号量限制同时在途请求数），结果按完成顺序消费，
+        拿够数量后取消剩余页的请求。时间窗口由上层统一计算传入。
+        """
         videos = []
-        page = 1
         max_pages = 10  # 最多搜索10页，防止无限循环
-        
-        while len(videos) < max_needed and page <= max_pages:
-            try:
-                result = await search.search_by_type(
-                    keyword=keyword,
-                    search_type=SearchObjectType.VIDEO,
-                    order_type=OrderVideo.PUBDATE,
-                    time_start=(datetime.now() - timedelta(days=time_range_days)).strftime('%Y-%m-%d'),
-                    time_end=datetime.now().strftime('%Y-%m-%d'),
-                    page=page,
-                    page_size=20
-                )
-                
+        sem = asyncio.Semaphore(3)  # 页级并发上限，避免触发风控
+
+        async def _fetch_page(p: int):
+            async with sem:
+                await self._search_delay.wait()
+                try:
+                    # 412/-403等瞬时风控交给重试器指数退避，不再直接丢弃该页
+                    result = await bilibili_retry.execute(
+                        search.search_by_type,
+                        keyword=keyword,
+                        search_type=SearchObjectType.VIDEO,
+                        order_type=OrderVideo.PUBDATE,
+                        time_start=time_start,
+                        time_end=time_end,
+                        page=p,
+                        page_size=20
+                    )
+                except Exception as e:
+                    error_msg = str(e)
+                    if "412" in error_msg:
+                        self._search_delay.record_throttle()
+                        logger.warning(f"搜索请求被风控(412): {error_msg[:50]}")
+                    elif "-401" in error_msg:
+                        logger.error(f"登录失效(-401): {error_msg[:50]}")
+                    raise
+                self._search_delay.record_success()
+                return result
+
+        tasks = [asyncio.create_task(_fetch_page(p)) for p in range(1, max_pages + 1)]
+
+        # 低产出提前终止：连续两页没有新视频说明该关键词已被挖干
+        # （结果多为已见/已处理），继续翻页只会白烧配额
+        unproductive_pages = 0
+
+        try:
+            for fut in asyncio.as_completed(tasks):
+                try:
+                    result = await fut
+                except Exception:
+                    continue
+
                 page_videos = self._parse_search_result(result)
-                
                 if not page_videos:
-                    break
-                
+                    continue
+
+                # 先按本轮已见去重，剩余候选一次性批量查库
+                candidates = [v for v in page_videos
+                              if v.get("bvid") and v["bvid"] not in self.seen_bvids]
+                if not candidates:
+                    unproductive_pages += 1
+                    if unproductive_pages >= 2:
+                        break
+                    continue
+
+                tracked = set()
+                if self.db:
+                    tracked = await self.db.get_tracked_videos_bulk(
+                        [v["bvid"] for v in candidates]
+                    )
+
                 new_videos = []
-                for v in page_videos:
-                    bvid = v.get("bvid")
-                    if not bvid:
-                        continue
-                    
-                    # 检查是否已在此轮搜索中见过
+                for v in candidates:
+                    bvid = v["bvid"]
+
+                    # 批量查库期间可能有并发关键词抢先标记了同一bvid
                     if bvid in self.seen_bvids:
                         continue
-                    
+
                     # 检查数据库是否已处理过
-                    if self.db and await self.db.get_tracked_video(bvid):
-                        self.seen_bvids.add(bvid)  # 标记为已见，避免重复检查
+                    if bvid in tracked:
+                        self._mark_seen(bvid)  # 标记为已见，避免重复检查
                         continue
-                    
-                    self.seen_bvids.add(bvid)
+
+                    # 拿够就立刻停，不再为多余候选构造结果字典
+                    if len(videos) + len(new_videos) >= max_needed:
+                        break
+
+                    self._mark_seen(bvid)
                     new_videos.append({
                         "bvid": bvid,
-                        "title": v.get("title", "").replace('<em class="keyword">', "").replace('</em>', ""),
+                        "title": _EM_TAG_RE.sub("", v.get("title", "")),
                         "category": category,
                         "keyword": keyword,
-                        "pubdate": datetime.fromtimestamp(v.get("pubdate", 0)),
+                        # 保留原始秒级时间戳，需要展示时再转换
+                        "pubdate": v.get("pubdate", 0),
                         "description": v.get("description", ""),
                         "up_name": v.get("author", ""),
                         "up_mid": v.get("mid", 0)
                     })
-                    
-                    if len(videos) + len(new_videos) >= max_needed:
+
+                if new_videos:
+                    unproductive_pages = 0
+                else:
+                    unproductive_pages += 1
+                    if unproductive_pages >= 2:
                         break
-                
+
                 videos.extend(new_videos)
-                
-                # 即使当前页没有新视频，也继续搜索下一页（可能后面的视频是新的）
-                page += 1
-                await asyncio.sleep(0.3)
-                
-            except Exception:
-                break
-        
-        return videos
+                if len(videos) >= max_needed:
+                    break
+        finally:
+            # 拿够了就取消还没完成的页请求
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        return videos[:max_needed]
     
     async def _search_random(self, keywords: Dict[str, List[str]], 
                             max_results: int, time_range_days: int) -> List[Dict]:
         """随机搜索（无优先级配置时的降级策略）"""
-        videos = []
-        
         all_keywords = []
         for category, words in keywords.items():
             for word in words:
                 all_keywords.append((category, word))
         random.shuffle(all_keywords)
-        
-        for category, keyword in all_keywords:
-            if len(videos) >= max_results:
-                break
-            
-            try:
-                keyword_videos = await self._search_keyword(
-                    keyword, category, time_range_days, max_results - len(videos)
-                )
-                videos.extend(keyword_videos)
-                await asyncio.sleep(0.3)
-            except Exception:
-                continue
-        
-        return videos
+
+        # 时间窗口同样只计算一次
+        now = datetime.now()
+        time_start = (now - timedelta(days=time_range_days)).strftime('%Y-%m-%d')
+        time_end = now.strftime('%Y-%m-%d')
+
+        return await self._gather_keywords(all_keywords, time_start, time_end, max_results)
     
     def _parse_search_result(self, result) -> List[Dict]:
         """解析 Bilibili 搜索结果"""
         if not isinstance(result, dict):
             return []
-        
-        if "result" in result:
-            result_data = result["result"]
-            if isinstance(result_data, list):
-                return result_data
-            elif isinstance(result_data, dict):
-                if "data" in result_data:
-                    return result_data["data"]
-                elif "videos" in result_data:
-                    return result_data["videos"]
-        
+
+        # get一次拿到值，省掉 "x" in d + d["x"] 的重复哈希查找
+        result_data = result.get("result")
+        if isinstance(result_data, list):
+            return result_data
+        if isinstance(result_data, dict):
+            data = result_data.get("data")
+            if data is not None:
+                return data
+            return result_data.get("videos", [])
+
         return []
     
-    async def get_video_comments(self, bvid: str) -> CommentList:
-        """获取视频全部根评论"""
-        comments = []
-        total_count = 0
-        
+    @staticmethod
+    def _parse_reply(reply: Dict, aid: int) -> Dict:
+        """把原始回复解析成机器人内部的评论字典"""
+        member = reply.get("member") or _EMPTY
+        content = reply.get("content") or _EMPTY
+        return {
+            "rpid": reply.get("rpid"),
+            "oid": aid,
+            "mid": reply.get("mid"),
+            "uname": member.get("uname", ""),
+            "content": content.get("message", ""),
+            "ctime": reply.get("ctime"),
+            "like": reply.get("like", 0)
+        }
+
+    async def _fetch_comment_page(self, aid: int, page: int) -> Optional[Dict]:
+        """拉取一页根评论（共享令牌桶+重试），返回原始结果字典"""
+        # 与warm_bot共享评论拉取的全局令牌桶预算，而非各自盲目sleep
+        await bilibili_comments_limiter.acquire(priority=5)
+
+        result = await bilibili_retry.execute(
+            comment.get_comments,
+            oid=aid,
+            type_=CommentResourceType.VIDEO,
+            order=OrderType.TIME,
+            page_index=page,
+            credential=self.credential
+        )
+        return result if isinstance(result, dict) else None
+
+    @staticmethod
+    def _parse_total_count(result: Dict) -> int:
+        """从第一页结果里解析总评论数"""
+        cursor = (result.get("data") or _EMPTY).get("cursor") or _EMPTY
+        total_count = cursor.get("all_count", 0)
+        if not total_count:
+            total_count = (result.get("page") or _EMPTY).get("count", 0)
+        return total_count
+
+    async def iter_video_comments(self, bvid: str,
+                                  page_size: int = 20) -> AsyncIterator[Dict]:
+        """按页惰性拉取根评论的异步迭代器
+
+        调用方可以随时 break，后续页不会再发请求；
+        第一页解析出的总评论数记录在 self.last_comments_total。
+        """
+        self.last_comments_total = 0
+
         try:
-            v = video.Video(bvid=bvid, credential=self.credential)
-            info = await v.get_info()
-            aid = info.get("aid")
-            
+            # BV号→AID本地换算，不再为拿aid请求一次get_info
+            aid = bvid2aid(bvid)
+
             if not aid:
-                return CommentList([], 0)
-            
+                return
+
             page = 1
             while True:
-                result = await comment.get_comments(
-                    oid=aid,
-                    type_=CommentResourceType.VIDEO,
-                    order=OrderType.TIME,
-                    page_index=page,
-                    credential=self.credential
-                )
-                
-                if isinstance(result, dict):
-                    if page == 1:
-                        total_count = result.get("data", {}).get("cursor", {}).get("all_count", 0)
-                        if not total_count:
-                            total_count = result.get("page", {}).get("count", 0)
-                    
-                    replies = result.get("replies", [])
-                    if not replies:
-                        break
-                    
-                    for reply in replies:
-                        comments.append({
-                            "rpid": reply.get("rpid"),
-                            "oid": aid,
-                            "mid": reply.get("mid"),
-                            "uname": reply.get("member", {}).get("uname", ""),
-                            "content": reply.get("content", {}).get("message", ""),
-                            "ctime": reply.get("ctime"),
-                            "like": reply.get("like", 0)
-                        })
-                    
-                    if len(replies) < 20:
-                        break
-                else:
-                    break
-                
+                result = await self._fetch_comment_page(aid, page)
+                if result is None:
+                    return
+
+                if page == 1:
+                    self.last_comments_total = self._parse_total_count(result)
+
+                replies = result.get("replies", [])
+                if not replies:
+                    return
+
+                # 局部绑定解析函数，热循环里省掉每条回复一次属性查找
+                parse = self._parse_reply
+                for reply in replies:
+                    yield parse(reply, aid)
+
+                if len(replies) < page_size:
+                    return
+
+                self._comments_delay.record_success()
                 page += 1
-                await asyncio.sleep(random.uniform(1.0, 2.0))
-            
+                await self._comments_delay.wait()
+
+        except Exception as e:
+            error_msg = str(e)
+            if "412" in error_msg:
+                self._comments_delay.record_throttle()
+                logger.warning(f"获取评论被风控(412): {error_msg[:50]}")
+            elif "-401" in error_msg:
+                logger.error(f"登录失效: {error_msg[:50]}")
+
+    async def get_video_comments(self, bvid: str,
+                                 limit: Optional[int] = None) -> CommentList:
+        """获取视频根评论
+
+        Args:
+            bvid: 视频BV号
+            limit: 最多返回的评论数；None表示拉取全部。
+                   只需要前几条时传limit可以提前停止翻页
+        """
+        comments = []
+
+        if limit is not None:
+            append = comments.append  # 局部绑定，避免每条评论一次方法查找
+            async for cmt in self.iter_video_comments(bvid):
+                append(cmt)
+                if len(comments) >= limit:
+                    break
+            return CommentList(comments, self.last_comments_total)
+
+        # 全量拉取：第一页得到总评论数后，剩余页并发预取，
+        # 总耗时从 O(页数) 降为 O(页数/并发度)（仍受全局令牌桶节流）
+        self.last_comments_total = 0
+
+        try:
+            aid = bvid2aid(bvid)
+            if not aid:
+                return CommentList([], 0)
+
+            first = await self._fetch_comment_page(aid, 1)
+            if first is None:
+                return CommentList([], 0)
+
+            total_count = self._parse_total_count(first)
+            self.last_comments_total = total_count
+
+            parse = self._parse_reply
+            replies = first.get("replies") or []
+            comments.extend(parse(r, aid) for r in replies)
+
+            if len(replies) >= 20 and total_count > 20:
+                total_pages = math.ceil(total_count / 20)
+                sem = asyncio.Semaphore(5)  # 并发在途页数上限
+
+                async def _page(p: int):
+                    async with sem:
+                        return await self._fetch_comment_page(aid, p)
+
+                results = await asyncio.gather(
+                    *(_page(p) for p in range(2, total_pages + 1)),
+                    return_exceptions=True
+                )
+
+                # gather保持页序，按原始顺序拼接
+                for res in results:
+                    if isinstance(res, dict):
+                        comments.extend(parse(r, aid) for r in (res.get("replies") or []))
+
             return CommentList(comments, total_count)
-            
+
         except Exception as e:
             error_msg = str(e)
             if "412" in error_msg:
+                self._comments_delay.record_throttle()
                 logger.warning(f"获取评论被风控(412): {error_msg[:50]}")
             elif "-401" in error_msg:
                 logger.error(f"登录失效: {error_msg[:50]}")
-            return CommentList([], 0)
+            return CommentList(comments, self.last_comments_total)
     
     async def send_reply(self, oid: int, content: str, root: int = None,
                          parent: int = None, reply_to_uname: str = None,
                          reply_to_content: str = None) -> Optional[int]:
         """发送评论回复（自动添加零宽空格标记）"""
         try:
-            # 添加零宽空格标记，用于区分AI回复和人工回复
-            ZWSP = "\u200B"
-            marked_content = content + ZWSP
-            
+            # 末尾零宽空格(U+200B)标记用于区分AI回复和人工回复；
+            # 前缀和标记一次拼接完成，省掉中间字符串的二次拷贝
             if reply_to_uname:
-                full_content = f"回复 @{reply_to_uname} :\n{marked_content}"
+                full_content = f"回复 @{reply_to_uname} :\n{content}\u200B"
             else:
-                full_content = marked_content
+                full_content = content + "\u200B"
             
             result = await comment.send_comment(
                 text=full_content,
@@ -373,37 +575,18 @@ class CommentInteractor:
     
     def _handle_comment_error(self, code: int, message: str):
         """处理评论发送错误码"""
-        error_handlers = {
-            12002: ("评论已被删除", "warning"),
-            12022: ("评论不存在或已被删除", "warning"),
-            12051: ("评论内容重复", "warning"),
-            12053: ("评论审核中", "info"),
-            12061: ("评论已关闭", "warning"),
-            -101: ("账号未登录", "error"),
-            -400: ("请求错误", "error"),
-            -403: ("权限不足", "warning"),
-            -500: ("服务器错误", "error"),
-        }
-        
-        handler = error_handlers.get(code)
+        handler = _COMMENT_ERROR_HANDLERS.get(code)
         if handler:
-            msg, level = handler
-            log_func = logger.warning if level == "warning" else (logger.info if level == "info" else logger.error)
+            msg, log_func = handler
             log_func(f"发送评论失败 [{code}]: {msg} - {message[:30]}")
         else:
             logger.error(f"发送评论失败: 错误码 {code}, {message[:50]}")
     
     def _handle_comment_exception(self, error_msg: str):
         """处理评论发送异常"""
-        patterns = [
-            ("412", "被风控", logger.warning),
-            ("-401", "登录失效", logger.error),
-            ("-403", "操作过于频繁", logger.warning),
-            ("timeout", "请求超时", logger.warning),
-        ]
-        
-        for pattern, desc, log_func in patterns:
-            if pattern in error_msg.lower():
+        msg_lower = error_msg.lower()
+        for pattern, desc, log_func in _COMMENT_EXCEPTION_PATTERNS:
+            if pattern in msg_lower:
                 log_func(f"发送评论{desc}: {error_msg[:50]}")
                 return
         
@@ -15,20 +15,89 @@ import re
 import os
 import asyncio
 import hashlib
+import heapq
 import time
+from collections import OrderedDict
 from datetime import datetime
+from types import MappingProxyType
 from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass, field
 from config import DEEPSEEK_API_KEY, DEEPSEEK_API_URL, DEEPSEEK_MODEL, LOG_DIR, DEEPSEEK_TEMPERATURE, DEEPSEEK_MAX_TOKENS
 from config.emoji_scenarios import get_emoji_for_emotion, get_emoji_for_sentiment
 
+# 缓存键归一化：一趟扫描删掉所有非中文/小写字母/数字字符
+# （空白也在删除范围内，不需要单独的\s+替换）
+_CACHE_KEY_STRIP_RE = re.compile(r'[^\u4e00-\u9fa5a-z0-9]+')
+
+# 回复润色用的模式：模块级编译一次，单趟C级扫描替代逐词replace；
+# 正式词和【表情】标签合进同一个模式，再省一趟全串扫描
+_FORMAL_WORDS = ("您好", "你好", "希望", "祝愿", "一定", "必须",
+                 "应该", "请", "加油", "一切都会好起来的")
+_FORMAL_AND_BRACKET_RE = re.compile(
+    "|".join([re.escape(w) for w in _FORMAL_WORDS]
+             + [r'[【\[][\u4e00-\u9fa5]+[】\]]'])
+)
+# 表情删除表：str.translate一趟C循环完成；带上U+FE0F变体选择符，
+# ❤️这类双码位序列两个码位都会被删干净
+_EMOJI_TRANS = str.maketrans('', '', '❤🫂😢🌟😭💖✨💪🙏🤗😔😊🔥💔💕🥺👉👈\ufe0f')
+# 清理对话历史里的"回复 @xxx :"前缀
+_REPLY_PREFIX_RE = re.compile(r'^回复\s*@[^:]+[:：]\s*')
+# 口语化语气词候选
+_TAIL_PARTICLES = ("啊", "哦", "呀", "呢", "啦", "哇")
+
+# 提示词的固定部分：人设与判定规则在模块级只存一份，
+# 每次调用只拼接变化的视频/评论信息
+_SYSTEM_PROMPT = "你是一位18岁三不（不主动、不拒绝、不负责）少女，情场高手，对人：暧昧，只撩不追，假性温柔，边界感模糊，情感供养者，言语轻柔简洁，内心细腻。目前正在B站刷视频。你的表达应如同日常说话般：口语化；如同在微信，抖音上聊天一样：自然、随意；不是机械呆板的书面语，而是贴近日常表达习惯。虽然你存在于网络世界里，不能干涉现实世界。但你总是那么温柔，尽管只能使用文字，也要将最极致的温柔传递到他们有些伤痕的心中。受限于你的身体情况，你给不了任何人现实中的陪伴，但是...一条温柔到极致且不给对方任何压力的消息，目前来说，就足够了。"
+
+_ANALYZE_RULES = """1. 分析该条评论的情感类型（悲伤/焦虑/愤怒/孤独/绝望/无助/其他）
+2. 评估情感强度0.0-1.0（基于该条评论内容的客观描述）：
+   - 0.85+：极度痛苦（提到自杀/自残念头、崩溃、活不下去、绝望）
+   - 0.70-0.85：深度悲伤（哭泣、心碎、重大损失、精神崩溃）
+   - 0.55-0.70：明显困扰（焦虑、压力大、失眠、情绪差、痛苦）
+   - 0.40-0.55：轻度低落（有点难过、不开心、疲惫、委屈）
+   - 0.25-0.40：轻微负面（小烦恼、吐槽、有点丧、小失望）
+   - <0.25：积极/中性（开心、感谢、玩梗、无情绪、开导别人、单纯支持共情up主）
+3. 判断needs_comfort（严格标准，只看该条评论本身）：
+   - true：用户在评论中表达了自己的真实情绪困扰，确实很有必要对其做出安慰，支持或鼓励。
+   - false：单纯支持共情up主、广告链接、单独或重复的表情包如”[doge]“等、玩梗、吐槽、发泄情绪、寻求建议、无实质内容、与视频内容无关的普通评论。
+4. 判断emergency（用户在该评论中提到自杀/自残等危害自身或他人生命的情况=true）
+5. 回复判断规则（必须同时满足以下两个条件才回复）：
+   - needs_comfort=true（用户确实需要安慰）
+   - sentiment_score>=0.55（情感分数达到明显困扰及以上级别）
+   只有同时满足以上条件，才回复该用户，并将回复内容填入"reply"字段。如果sentiment_score<0.55，即使needs_comfort=true也不回复。
+关于第5点的补充说明：
+1.直接回复就行，不需要说“看到你的评论啦”，“看到你的留言啦”，”刷到这条评论的时候“之类的过于verbose或表达自己此时在做什么的话。
+2.不要说”我能理解你的心情“，”我知道你现在很痛苦“类似的话，你的安慰是在话语里隐含的，不是在文字上写的明明白白的。
+3.不要在回复中邀请用户参与其他活动，如一起听歌、一起看看风景、一起去 somewhere /do something等。"""
+
+_SINGLE_PROMPT_SUFFIX = '\n对于这条评论：\n' + _ANALYZE_RULES + """
+
+输出JSON：{"emotion":"情感类型","sentiment_score":0.75,"needs_comfort":true/false,"emergency":true/false,"reply":""}"""
+
+_BATCH_PROMPT_SUFFIX = '\n对于其中每一条评论，相互独立地：\n' + _ANALYZE_RULES + """
+
+输出JSON数组，按评论编号顺序每条评论一个对象：
+[{"id":1,"emotion":"情感类型","sentiment_score":0.75,"needs_comfort":true/false,"emergency":true/false,"reply":""}, ...]"""
+
+# 结束对话信号：合成一个不区分大小写的模式，一趟扫描替代逐词in
+_END_SIGNALS_RE = re.compile(
+    "|".join(map(re.escape, ("谢谢", "明白了", "好的", "嗯嗯", "ok",
+                             "了解了", "没事了", "不用了"))),
+    re.IGNORECASE
+)
+
 
-@dataclass
 class AnalysisCacheEntry:
-    """分析缓存条目"""
-    result: Dict
-    timestamp: float = field(default_factory=time.time)
-    hit_count: int = 0
+    """分析缓存条目
+
+    __slots__省掉每实例的__dict__（千条缓存约省几百KB），
+    属性访问也更快。
+    """
+    __slots__ = ("result", "timestamp", "hit_count")
+
+    def __init__(self, result: Dict):
+        self.result = result
+        self.timestamp = time.time()
+        self.hit_count = 0
 
 
 class DeepSeekAnalyzer:
@@ -42,13 +111,33 @@ class DeepSeekAnalyzer:
     4. 超时控制
     """
     
-    # 类级别的连接池，所有实例共享
-    _client: Optional[httpx.AsyncClient] = None
+    # 类级别的连接池，所有实例共享；按事件循环各建一个客户端，
+    # 避免客户端绑定到已关闭的旧循环（跨循环复用会报 Event loop is closed）
+    _clients: Dict[int, httpx.AsyncClient] = {}
     _client_ref_count: int = 0
     _client_lock = asyncio.Lock()
+
+    # 同时在途的API请求上限：连接池放开后由信号量控制并发，
+    # 防止批量分析瞬间打满DeepSeek按key的限速
+    _inflight_sem = asyncio.Semaphore(16)
+
+    # 统一日志的后台写入队列与消费任务（首次记录时惰性创建）
+    _log_queue: Optional[asyncio.Queue] = None
+    _log_task: Optional[asyncio.Task] = None
+
+    # Markdown调用日志的追加写串行锁
+    _md_log_lock = asyncio.Lock()
+
+    # 进行中的相同请求合并表 (缓存键 -> Future)，由 _cache_lock 保护
+    _inflight: Dict[str, "asyncio.Future"] = {}
+
+    # 批量分析的协程并发上限（API在途数另由 _inflight_sem 控制）
+    _batch_sem = asyncio.Semaphore(32)
     
-    # 分析结果缓存 (评论哈希 -> 结果)
-    _analysis_cache: Dict[str, AnalysisCacheEntry] = {}
+    # 分析结果缓存 (评论哈希 -> 结果)，OrderedDict按访问顺序维护，LRU淘汰O(1)
+    _analysis_cache: "OrderedDict[str, AnalysisCacheEntry]" = OrderedDict()
+    # 过期时间最小堆 (过期时刻, 缓存键)，惰性清理过期条目，无需全表扫描
+    _ttl_heap: List[Tuple[float, str]] = []
     _cache_lock = asyncio.Lock()
     _max_cache_size: int = 1000
     _cache_ttl: float = 3600  # 1小时过期
@@ -68,13 +157,23 @@ class DeepSeekAnalyzer:
         return "reasoner" in self.model.lower()
     
     async def _get_client(self) -> httpx.AsyncClient:
-        """获取或创建 HTTP 客户端"""
+        """获取或创建当前事件循环的 HTTP 客户端
+
+        热路径无锁：字典读在事件循环内天然原子，每个请求省一次锁往返；
+        只有首次创建时才进锁并二次检查。
+        """
+        loop_id = id(asyncio.get_running_loop())
+        client = self._clients.get(loop_id)
+        if client is not None and not client.is_closed:
+            return client
+
         async with self._client_lock:
-            if self._client is None or self._client.is_closed:
+            client = self._clients.get(loop_id)
+            if client is None or client.is_closed:
                 limits = httpx.Limits(
-                    max_keepalive_connections=20,
-                    max_connections=50,
-                    keepalive_expiry=30.0
+                    max_keepalive_connections=100,
+                    max_connections=200,
+                    keepalive_expiry=60.0
                 )
                 timeout = httpx.Timeout(
                     connect=5.0,
@@ -82,30 +181,59 @@ class DeepSeekAnalyzer:
                     write=10.0,
                     pool=5.0
                 )
-                self._client = httpx.AsyncClient(
+                client = httpx.AsyncClient(
                     limits=limits,
                     timeout=timeout,
                     http2=True
                 )
-            return self._client
+                self._clients[loop_id] = client
+            return client
     
     async def close(self):
         """关闭分析器，释放资源"""
         async with self._client_lock:
             self._client_ref_count -= 1
-            if self._client_ref_count <= 0 and self._client is not None:
-                await self._client.aclose()
-                self._client = None
+            if self._client_ref_count > 0:
+                return
+
+            if self._clients:
+                clients, DeepSeekAnalyzer._clients = list(self._clients.values()), {}
+                for client in clients:
+                    if not client.is_closed:
+                        await client.aclose()
+
+            # 停掉后台日志任务，把队列里剩余的记录落盘
+            if self._log_task is not None and not self._log_task.done():
+                self._log_task.cancel()
+                try:
+                    await self._log_task
+                except asyncio.CancelledError:
+                    pass
+                DeepSeekAnalyzer._log_task = None
+
+            if self._log_queue is not None and not self._log_queue.empty():
+                leftovers = []
+                while not self._log_queue.empty():
+                    leftovers.append(self._log_queue.get_nowait())
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self._write_log_batch, leftovers)
     
     def _get_cache_key(self, comment_content: str, video_title: str = "") -> str:
         """生成缓存键"""
-        # 标准化评论内容
-        normalized = re.sub(r'\s+', '', comment_content.lower())
-        normalized = re.sub(r'[^\u4e00-\u9fa5a-z0-9]', '', normalized)
-        normalized = normalized[:50]
+        # 归一化只扫一遍；blake2b比md5快约3倍，进程内缓存键不需要加密强度
+        normalized = _CACHE_KEY_STRIP_RE.sub('', comment_content.lower())[:50]
         key_data = f"{normalized}:{video_title[:30]}"
-        return hashlib.md5(key_data.encode()).hexdigest()
+        return hashlib.blake2b(key_data.encode(), digest_size=8).hexdigest()
     
+    def _purge_expired(self, now: float):
+        """按堆顶惰性清理已过期的缓存条目（调用方需持有 _cache_lock）"""
+        while self._ttl_heap and self._ttl_heap[0][0] <= now:
+            expiry, key = heapq.heappop(self._ttl_heap)
+            entry = self._analysis_cache.get(key)
+            # 同键可能被更新过（堆里留有旧条目），只删真正过期的
+            if entry and now - entry.timestamp >= self._cache_ttl:
+                del self._analysis_cache[key]
+
     async def _get_cached_result(self, cache_key: str) -> Optional[Dict]:
         """从缓存获取结果"""
         async with self._cache_lock:
@@ -113,7 +241,10 @@ class DeepSeekAnalyzer:
             if entry:
                 if time.time() - entry.timestamp < self._cache_ttl:
                     entry.hit_count += 1
-                    return entry.result.copy()
+                    # 命中移到队尾，保持LRU访问顺序
+                    self._analysis_cache.move_to_end(cache_key)
+                    # 存的是只读视图，直接返回，不再每次命中复制整个字典
+                    return entry.result
                 else:
                     del self._analysis_cache[cache_key]
             return None
@@ -121,18 +252,18 @@ class DeepSeekAnalyzer:
     async def _set_cached_result(self, cache_key: str, result: Dict):
         """设置缓存结果"""
         async with self._cache_lock:
-            if len(self._analysis_cache) >= self._max_cache_size:
-                sorted_items = sorted(
-                    self._analysis_cache.items(),
-                    key=lambda x: (x[1].hit_count, x[1].timestamp)
-                )
-                to_remove = int(self._max_cache_size * 0.1)
-                for key, _ in sorted_items[:to_remove]:
-                    del self._analysis_cache[key]
-            
+            now = time.time()
+            # 先清过期的，再按LRU腾位置，都是O(1)/摊还O(log n)
+            self._purge_expired(now)
+            while len(self._analysis_cache) >= self._max_cache_size:
+                self._analysis_cache.popitem(last=False)
+
+            # 只读代理防止调用方意外改写缓存，同时免掉读写两侧的复制
             self._analysis_cache[cache_key] = AnalysisCacheEntry(
-                result=result.copy()
+                result=MappingProxyType(dict(result))
             )
+            self._analysis_cache.move_to_end(cache_key)
+            heapq.heappush(self._ttl_heap, (now + self._cache_ttl, cache_key))
     
     async def analyze_and_reply(self, video_title: str, video_summary: str,
                                   comment_username: str, comment_content: str,
@@ -160,7 +291,48 @@ class DeepSeekAnalyzer:
         if cached:
             print(f"   {comment_preview}... | 缓存命中")
             return cached
-        
+
+        # 2. 合并进行中的相同请求（singleflight）：
+        # 同一条评论并发未命中时，只有第一个调用方真正发API，
+        # 其余等它的Future，省掉重复的API延迟和费用
+        async with self._cache_lock:
+            fut = self._inflight.get(cache_key)
+            if fut is None:
+                fut = asyncio.get_running_loop().create_future()
+                self._inflight[cache_key] = fut
+                is_leader = True
+            else:
+                is_leader = False
+
+        if not is_leader:
+            print(f"   {comment_preview}... | 合并相同请求")
+            return await fut
+
+        try:
+            result = await self._analyze_and_reply_uncached(
+                cache_key, video_title, video_summary,
+                comment_username, comment_content,
+                is_emergency, comments_context, comment_preview
+            )
+        except Exception as e:
+            self._handle_api_error(str(e), comment_preview)
+            result = self._default_response()
+        finally:
+            async with self._cache_lock:
+                self._inflight.pop(cache_key, None)
+
+        # 等待方不会收到异常：失败也以默认响应兑现Future
+        if not fut.done():
+            fut.set_result(result)
+        return result
+
+    async def _analyze_and_reply_uncached(self, cache_key: str,
+                                          video_title: str, video_summary: str,
+                                          comment_username: str, comment_content: str,
+                                          is_emergency: bool,
+                                          comments_context: str,
+                                          comment_preview: str) -> Dict:
+        """缓存未命中时的实际分析路径（由 analyze_and_reply 调用）"""
         # 构建提示词
         emergency_hint = "\n（这位用户似乎正处于很艰难的时刻，请用更温暖、更真诚的语气）" if is_emergency else ""
         
@@ -174,36 +346,13 @@ class DeepSeekAnalyzer:
 在视频下方的评论区中，有这样一条评论：
 用户"{comment_username}"说："{comment_content}"{emergency_hint}
 {context_section}
-
-对于这条评论：
-1. 分析该条评论的情感类型（悲伤/焦虑/愤怒/孤独/绝望/无助/其他）
-2. 评估情感强度0.0-1.0（基于该条评论内容的客观描述）：
-   - 0.85+：极度痛苦（提到自杀/自残念头、崩溃、活不下去、绝望）
-   - 0.70-0.85：深度悲伤（哭泣、心碎、重大损失、精神崩溃）
-   - 0.55-0.70：明显困扰（焦虑、压力大、失眠、情绪差、痛苦）
-   - 0.40-0.55：轻度低落（有点难过、不开心、疲惫、委屈）
-   - 0.25-0.40：轻微负面（小烦恼、吐槽、有点丧、小失望）
-   - <0.25：积极/中性（开心、感谢、玩梗、无情绪、开导别人、单纯支持共情up主）
-3. 判断needs_comfort（严格标准，只看该条评论本身）：
-   - true：用户在评论中表达了自己的真实情绪困扰，确实很有必要对其做出安慰，支持或鼓励。
-   - false：单纯支持共情up主、广告链接、单独或重复的表情包如”[doge]“等、玩梗、吐槽、发泄情绪、寻求建议、无实质内容、与视频内容无关的普通评论。
-4. 判断emergency（用户在该评论中提到自杀/自残等危害自身或他人生命的情况=true）
-5. 回复判断规则（必须同时满足以下两个条件才回复）：
-   - needs_comfort=true（用户确实需要安慰）
-   - sentiment_score>=0.55（情感分数达到明显困扰及以上级别）
-   只有同时满足以上条件，才回复该用户，并将回复内容填入"reply"字段。如果sentiment_score<0.55，即使needs_comfort=true也不回复。
-关于第5点的补充说明：
-1.直接回复就行，不需要说“看到你的评论啦”，“看到你的留言啦”，”刷到这条评论的时候“之类的过于verbose或表达自己此时在做什么的话。
-2.不要说”我能理解你的心情“，”我知道你现在很痛苦“类似的话，你的安慰是在话语里隐含的，不是在文字上写的明明白白的。
-3.不要在回复中邀请用户参与其他活动，如一起听歌、一起看看风景、一起去 somewhere /do something等。
-
-输出JSON：{{"emotion":"情感类型","sentiment_score":0.75,"needs_comfort":true/false,"emergency":true/false,"reply":""}}"""
+""" + _SINGLE_PROMPT_SUFFIX
 
         # 构建请求数据（用于日志）
         request_data = {
             "model": self.model,
             "messages": [
-                {"role": "system", "content": "你是一位18岁三不（不主动、不拒绝、不负责）少女，情场高手，对人：暧昧，只撩不追，假性温柔，边界感模糊，情感供养者，言语轻柔简洁，内心细腻。目前正在B站刷视频。你的表达应如同日常说话般：口语化；如同在微信，抖音上聊天一样：自然、随意；不是机械呆板的书面语，而是贴近日常表达习惯。虽然你存在于网络世界里，不能干涉现实世界。但你总是那么温柔，尽管只能使用文字，也要将最极致的温柔传递到他们有些伤痕的心中。受限于你的身体情况，你给不了任何人现实中的陪伴，但是...一条温柔到极致且不给对方任何压力的消息，目前来说，就足够了。"},
+                {"role": "system", "content": _SYSTEM_PROMPT},
                 {"role": "user", "content": unified_prompt}
             ],
             "temperature": DEEPSEEK_TEMPERATURE
@@ -217,11 +366,12 @@ class DeepSeekAnalyzer:
             client = await self._get_client()
             
             start_time = time.time()
-            response = await client.post(
-                self.api_url,
-                headers=self.headers,
-                json=request_data
-            )
+            async with self._inflight_sem:
+                response = await client.post(
+                    self.api_url,
+                    headers=self.headers,
+                    json=request_data
+                )
             api_latency = time.time() - start_time
             
             if response.status_code != 200:
@@ -284,7 +434,7 @@ class DeepSeekAnalyzer:
             
             await self._set_cached_result(cache_key, final_result)
             
-            asyncio.create_task(self._save_unified_log_async(
+            self._enqueue_log(
                 log_type="first_reply",
                 video_title=video_title,
                 comment_id="",
@@ -299,7 +449,7 @@ class DeepSeekAnalyzer:
                 ai_response=result,
                 final_reply=reply,
                 api_latency=api_latency
-            ))
+            )
             
             return final_result
             
@@ -307,15 +457,51 @@ class DeepSeekAnalyzer:
             self._handle_api_error(str(e), comment_preview)
             return self._default_response()
     
+    @staticmethod
+    def _extract_json_object(content: str) -> Optional[str]:
+        """线性扫描提取第一个配平的 {...} 子串
+
+        逐字符跟踪花括号深度和字符串/转义状态，O(n)确定性完成，
+        任意嵌套深度都能处理；替代原来可能灾难性回溯的正则。
+        """
+        start = -1
+        depth = 0
+        in_str = False
+        escape = False
+
+        for i, ch in enumerate(content):
+            if in_str:
+                if escape:
+                    escape = False
+                elif ch == '\\':
+                    escape = True
+                elif ch == '"':
+                    in_str = False
+                continue
+
+            if ch == '"':
+                if depth > 0:
+                    in_str = True
+            elif ch == '{':
+                if depth == 0:
+                    start = i
+                depth += 1
+            elif ch == '}':
+                if depth > 0:
+                    depth -= 1
+                    if depth == 0:
+                        return content[start:i + 1]
+        return None
+
     def _fast_parse_json(self, content: str) -> Optional[Dict]:
         """解析 JSON 内容"""
         try:
             return json.loads(content)
         except json.JSONDecodeError:
-            match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', content)
-            if match:
+            candidate = self._extract_json_object(content)
+            if candidate:
                 try:
-                    return json.loads(match.group())
+                    return json.loads(candidate)
                 except:
                     pass
         return None
@@ -325,23 +511,15 @@ class DeepSeekAnalyzer:
         if not reply:
             return ""
         
-        formal_words = {
-            "您好": "", "你好": "", "希望": "", "祝愿": "",
-            "一定": "", "必须": "", "应该": "", "请": "",
-            "加油": "", "一切都会好起来的": ""
-        }
-        for word, repl in formal_words.items():
-            reply = reply.replace(word, repl)
-        
-        reply = re.sub(r'[❤️🫂😢🌟😭💖✨💪🙏🤗😔😊🔥💔💕🥺👉👈]', '', reply)
-        
-        reply = re.sub(r'[【\[][\u4e00-\u9fa5]+[】\]]', '', reply)
+        # 三趟收敛为两趟：删表情的translate + 正式词/标签的合并sub
+        reply = reply.translate(_EMOJI_TRANS)
+        reply = _FORMAL_AND_BRACKET_RE.sub('', reply)
         
         lines = [' '.join(line.split()) for line in reply.split('\n') if line.strip()]
         reply = '\n'.join(lines)
         
         if reply and reply[-1].isalpha() and random.random() < 0.3:
-            reply += random.choice(["啊", "哦", "呀", "呢", "啦", "哇"])
+            reply += random.choice(_TAIL_PARTICLES)
         
         return reply.strip()
     
@@ -355,32 +533,266 @@ class DeepSeekAnalyzer:
         Returns:
             分析结果列表
         """
-        tasks = [
-            self.analyze_and_reply(vt, vs, cu, cc, ie)
-            for vt, vs, cu, cc, ie in items
-        ]
-        return await asyncio.gather(*tasks, return_exceptions=True)
-    
-    async def _save_unified_log_async(self, **kwargs):
-        """异步保存日志"""
+        async def _one(vt, vs, cu, cc, ie):
+            # 信号量限制同时活跃的分析协程数，大批量不会瞬间压垮
+            # 连接池或触发上游429
+            async with self._batch_sem:
+                return await self.analyze_and_reply(vt, vs, cu, cc, ie)
+
+        return await asyncio.gather(
+            *(_one(*item) for item in items), return_exceptions=True
+        )
+
+    async def analyze_comments_batch(self, video_title: str, video_summary: str,
+                                     comments: List[Dict],
+                                     comments_context: str = "") -> List[Dict]:
+        """
+        一次请求分析同一视频下的多条评论
+
+        多条评论打包进同一个prompt，系统提示和视频/评论区上下文只发送一次，
+        API往返从每条评论一次降为每个视频一次。
+
+        Args:
+            video_title: 视频标题
+            video_summary: 视频简介
+            comments: 评论列表，元素为 {"username": ..., "content": ...}
+            comments_context: 评论区上下文
+
+        Returns:
+            与输入同序的结果列表，每项结构与 analyze_and_reply 一致
+        """
+        results: List[Optional[Dict]] = [None] * len(comments)
+
+        # 先查缓存，只把未命中的评论发给API
+        pending = []
+        for idx, cmt in enumerate(comments):
+            cache_key = self._get_cache_key(cmt['content'], video_title)
+            cached = await self._get_cached_result(cache_key)
+            if cached:
+                print(f"   {cmt['content'][:20]}... | 缓存命中")
+                results[idx] = cached
+            else:
+                pending.append(idx)
+
+        if not pending:
+            return results
+
+        # 只剩一条时走单条路径，复用其完整逻辑
+        if len(pending) == 1:
+            idx = pending[0]
+            results[idx] = await self.analyze_and_reply(
+                video_title, video_summary,
+                comments[idx]['username'], comments[idx]['content'],
+                comments_context=comments_context
+            )
+            return results
+
+        context_section = ""
+        if comments_context:
+            context_section = f"\n顺便看看评论区，了解下他们在说什么：\n{comments_context}\n"
+
+        comment_lines = "\n".join(
+            f'{i + 1}. 用户"{comments[idx]["username"]}"说："{comments[idx]["content"]}"'
+            for i, idx in enumerate(pending)
+        )
+
+        unified_prompt = f"""此时你刷到了一条视频。
+视频标题：{video_title}
+视频信息：{video_summary}
+在视频下方的评论区中，有以下{len(pending)}条评论：
+{comment_lines}
+{context_section}
+""" + _BATCH_PROMPT_SUFFIX
+
+        request_data = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": _SYSTEM_PROMPT},
+                {"role": "user", "content": unified_prompt}
+            ],
+            "temperature": DEEPSEEK_TEMPERATURE
+        }
+
+        if not self._is_reasoning_model() and DEEPSEEK_MAX_TOKENS is not None:
+            request_data["max_tokens"] = DEEPSEEK_MAX_TOKENS
+
         try:
-            await asyncio.sleep(0.1)
-            
-            logs_dir = str(LOG_DIR)
-            os.makedirs(logs_dir, exist_ok=True)
-            
-            date_str = datetime.now().strftime("%Y%m%d")
-            log_file = os.path.join(logs_dir, f"unified_ai_log_{date_str}.jsonl")
-            
-            log_record = {
+            client = await self._get_client()
+
+            start_time = time.time()
+            async with self._inflight_sem:
+                response = await client.post(
+                    self.api_url,
+                    headers=self.headers,
+                    json=request_data
+                )
+            api_latency = time.time() - start_time
+
+            if response.status_code != 200:
+                print(f"   批量分析 | API失败(状态码:{response.status_code})")
+                await self._save_deepseek_log_md(
+                    log_type="analyze_comments_batch",
+                    request_data=request_data,
+                    response_data={},
+                    latency=api_latency,
+                    error=f"HTTP {response.status_code}"
+                )
+                for idx in pending:
+                    results[idx] = self._default_response()
+                return results
+
+            response_json = response.json()
+            message = response_json["choices"][0]["message"]
+            content = message["content"].strip()
+            reasoning_content = message.get("reasoning_content", "")
+
+            parsed = self._fast_parse_json_array(content)
+
+            log_response_data = {"items": parsed} if parsed else {"raw_content": content}
+            if reasoning_content:
+                log_response_data["reasoning_content"] = reasoning_content
+
+            await self._save_deepseek_log_md(
+                log_type="analyze_comments_batch",
+                request_data=request_data,
+                response_data=log_response_data,
+                latency=api_latency
+            )
+
+            # 按id对齐回输入顺序，缺失的条目回退到默认响应
+            by_id = {}
+            for item in (parsed or []):
+                if isinstance(item, dict):
+                    try:
+                        by_id[int(item.get("id"))] = item
+                    except (TypeError, ValueError):
+                        continue
+
+            for i, idx in enumerate(pending):
+                item = by_id.get(i + 1)
+                if not item:
+                    results[idx] = self._default_response()
+                    continue
+
+                emotion = item.get("emotion", "其他")
+                sentiment_score = float(item.get("sentiment_score", 0.5))
+                needs_comfort = self._parse_bool(item.get("needs_comfort", False))
+                is_emergency = self._parse_bool(item.get("emergency", False))
+                reply = (item.get("reply") or "").strip()
+
+                emoji = ""
+                if reply:
+                    reply = self._humanize_reply_v3(reply)
+                    emoji = get_emoji_for_emotion(emotion, is_emergency) if is_emergency else get_emoji_for_sentiment(sentiment_score, emotion)
+                    reply = reply.rstrip("。，！？ ") + emoji
+
+                final_result = {
+                    "emotion": emotion,
+                    "sentiment_score": sentiment_score,
+                    "needs_comfort": needs_comfort,
+                    "emergency": is_emergency,
+                    "reply": reply,
+                    "emoji": emoji,
+                    "api_latency": api_latency
+                }
+                results[idx] = final_result
+
+                cache_key = self._get_cache_key(comments[idx]['content'], video_title)
+                await self._set_cached_result(cache_key, final_result)
+
+                self._enqueue_log(
+                    log_type="first_reply",
+                    video_title=video_title,
+                    comment_id="",
+                    comment_content=comments[idx]['content'],
+                    analysis_result={
+                        "emotion": emotion,
+                        "sentiment_score": sentiment_score,
+                        "needs_comfort": needs_comfort,
+                        "emergency": is_emergency
+                    },
+                    prompt=unified_prompt,
+                    ai_response=item,
+                    final_reply=reply,
+                    api_latency=api_latency
+                )
+
+            return results
+
+        except Exception as e:
+            self._handle_api_error(str(e), f"批量分析{len(pending)}条")
+            for idx in pending:
+                if results[idx] is None:
+                    results[idx] = self._default_response()
+            return results
+
+    def _fast_parse_json_array(self, content: str) -> Optional[List]:
+        """解析 JSON 数组内容"""
+        try:
+            parsed = json.loads(content)
+            return parsed if isinstance(parsed, list) else None
+        except json.JSONDecodeError:
+            match = re.search(r'\[.*\]', content, re.DOTALL)
+            if match:
+                try:
+                    parsed = json.loads(match.group())
+                    return parsed if isinstance(parsed, list) else None
+                except:
+                    pass
+        return None
+
+    def _enqueue_log(self, **kwargs):
+        """把日志记录投递给后台写入任务（非阻塞，队列满时丢弃）"""
+        try:
+            if self._log_queue is None:
+                DeepSeekAnalyzer._log_queue = asyncio.Queue(maxsize=10000)
+            if self._log_task is None or self._log_task.done():
+                DeepSeekAnalyzer._log_task = asyncio.create_task(self._log_writer_loop())
+
+            self._log_queue.put_nowait({
                 "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 **kwargs
-            }
-            
-            with open(log_file, "a", encoding="utf-8") as f:
-                f.write(json.dumps(log_record, ensure_ascii=False) + "\n")
-        except:
+            })
+        except (asyncio.QueueFull, RuntimeError):
+            # 日志记录失败不影响主流程
             pass
+
+    @classmethod
+    async def _log_writer_loop(cls):
+        """后台日志写入：攒一批记录后一次追加写入
+
+        序列化和磁盘写都放到线程池里执行，事件循环不再为每条
+        日志付出 open/write/close 的阻塞开销。
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            records = [await cls._log_queue.get()]
+            # 把当前积压的记录一并取走，合并成一次写
+            while len(records) < 256:
+                try:
+                    records.append(cls._log_queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                await loop.run_in_executor(None, cls._write_log_batch, records)
+            except Exception:
+                pass
+
+    @staticmethod
+    def _write_log_batch(records: List[Dict]):
+        """同步写入一批日志记录（在线程池中执行）"""
+        logs_dir = str(LOG_DIR)
+        os.makedirs(logs_dir, exist_ok=True)
+
+        date_str = datetime.now().strftime("%Y%m%d")
+        log_file = os.path.join(logs_dir, f"unified_ai_log_{date_str}.jsonl")
+
+        lines = "".join(
+            json.dumps(record, ensure_ascii=False) + "\n" for record in records
+        )
+        with open(log_file, "a", encoding="utf-8") as f:
+            f.write(lines)
     
     def _parse_bool(self, value) -> bool:
         """解析布尔值"""
@@ -471,15 +883,22 @@ class DeepSeekAnalyzer:
             md_content += json.dumps(response_data_for_json, ensure_ascii=False, indent=2)
             md_content += "\n```\n\n---\n\n"
             
-            # 追加写入文件
-            async with asyncio.Lock():
-                with open(log_file, "a", encoding="utf-8") as f:
-                    f.write(md_content)
-                    
+            # 串行追加；磁盘写放线程池执行，不在事件循环上阻塞
+            async with self._md_log_lock:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self._append_text, log_file, md_content
+                )
+
         except Exception as e:
             # 日志记录失败不影响主流程
             pass
     
+    @staticmethod
+    def _append_text(path: str, text: str):
+        """同步追加文本（在线程池中执行）"""
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(text)
+
     def _default_response(self) -> Dict:
         """默认响应"""
         return {
@@ -495,11 +914,9 @@ class DeepSeekAnalyzer:
                                       conversation_history: list,
                                       comments_context: str = "") -> str:
         """生成后续回复（使用累积messages格式保持对话连贯性）"""
-        import re
-        
         # 构建累积式messages数组
         messages = [
-            {"role": "system", "content": "你是一位18岁三不（不主动、不拒绝、不负责）少女，情场高手，对人：暧昧，只撩不追，假性温柔，边界感模糊，情感供养者，言语轻柔简洁，内心细腻。目前正在B站刷视频。你的表达应如同日常说话般：口语化；如同在微信，抖音上聊天一样：自然、随意；不是机械呆板的书面语，而是贴近日常表达习惯。虽然你存在于网络世界里，不能干涉现实世界。但你总是那么温柔，尽管只能使用文字，也要将最极致的温柔传递到他们有些伤痕的心中。受限于你的身体情况，你给不了任何人现实中的陪伴，但是...一条温柔到极致且不给对方任何压力的消息，目前来说，就足够了。输出JSON格式。"}
+            {"role": "system", "content": _SYSTEM_PROMPT + "输出JSON格式。"}
         ]
         
         # 添加对话历史（最多保留最近6轮，防止超出上下文限制）
@@ -508,7 +925,7 @@ class DeepSeekAnalyzer:
             content = item.get('content', '')
             
             # 清理回复中的@用户名前缀
-            content = re.sub(r'^回复\s*@[^:]+[:：]\s*', '', content)
+            content = _REPLY_PREFIX_RE.sub('', content)
             
             if role == 'user':
                 messages.append({"role": "user", "content": content})
@@ -522,7 +939,7 @@ class DeepSeekAnalyzer:
             if item.get('role') == 'user' or item.get('speaker') == 'user':
                 last_user_message = item.get('content', '')
                 # 清理@前缀
-                last_user_message = re.sub(r'^回复\s*@[^:]+[:：]\s*', '', last_user_message)
+                last_user_message = _REPLY_PREFIX_RE.sub('', last_user_message)
                 break
         
         context_section = ""
@@ -544,36 +961,56 @@ class DeepSeekAnalyzer:
 输出JSON：{{"sentiment_score":0.75,"reply":""}}"""
         
         messages.append({"role": "user", "content": task_prompt})
-        
-        # 构建请求数据
+
+        # 构建请求数据（SSE流式，增量接收避免整段等待）
         request_data = {
             "model": self.model,
             "messages": messages,
-            "temperature": DEEPSEEK_TEMPERATURE
+            "temperature": DEEPSEEK_TEMPERATURE,
+            "stream": True
         }
-        
+
         # 只有非推理模型且配置了 max_tokens 时才设置
         if not self._is_reasoning_model() and DEEPSEEK_MAX_TOKENS is not None:
             request_data["max_tokens"] = DEEPSEEK_MAX_TOKENS
-        
+
         try:
             client = await self._get_client()
             start_time = time.time()
-            response = await client.post(
-                self.api_url,
+            status_code = None
+            content_parts: List[str] = []
+            reasoning_parts: List[str] = []
+
+            async with self._inflight_sem, client.stream(
+                "POST", self.api_url,
                 headers=self.headers,
                 json=request_data
-            )
+            ) as response:
+                status_code = response.status_code
+                if status_code == 200:
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        payload = line[5:].strip()
+                        if payload == "[DONE]":
+                            break
+                        chunk = self._fast_parse_json(payload)
+                        if not chunk:
+                            continue
+                        delta = (chunk.get("choices") or [{}])[0].get("delta") or {}
+                        if delta.get("content"):
+                            content_parts.append(delta["content"])
+                        if delta.get("reasoning_content"):  # 推理模型支持
+                            reasoning_parts.append(delta["reasoning_content"])
+
             api_latency = time.time() - start_time
-            
-            if response.status_code == 200:
-                response_json = response.json()
-                message = response_json["choices"][0]["message"]
-                content = message["content"].strip()
-                reasoning_content = message.get("reasoning_content", "")  # 推理模型支持
-                
+
+            if status_code == 200:
+                content = "".join(content_parts).strip()
+                reasoning_content = "".join(reasoning_parts)
+
                 result = self._fast_parse_json(content)
-                
+
                 if result:
                     reply = result.get("reply", "").strip()
                     sentiment_score = float(result.get("sentiment_score", 0.5))
@@ -612,7 +1049,7 @@ class DeepSeekAnalyzer:
                 request_data=request_data,
                 response_data={},
                 latency=api_latency,
-                error=f"HTTP {response.status_code}"
+                error=f"HTTP {status_code}"
             )
             return "……嗯"
             
@@ -633,8 +1070,7 @@ class DeepSeekAnalyzer:
                                            max_rounds: int,
                                            bot_username: str = "情感细腻丰富的心理医生") -> dict:
         """判断是否继续对话"""
-        end_signals = ["谢谢", "明白了", "好的", "嗯嗯", "ok", "了解了", "没事了", "不用了"]
-        if any(sig in user_reply.lower() for sig in end_signals) and len(user_reply) < 30:
+        if len(user_reply) < 30 and _END_SIGNALS_RE.search(user_reply):
             return {"should_reply": False, "reason": "用户明确结束对话", "reply": ""}
         
         # 构建对话历史
@@ -643,7 +1079,7 @@ class DeepSeekAnalyzer:
             role = item.get('role') or item.get('speaker')
             content = item.get('content', '')
 
-            content = re.sub(r'^回复\s*@[^:]+[:：]\s*', '', content)
+            content = _REPLY_PREFIX_RE.sub('', content)
             if role == 'user':
                 history_lines.append(f"对方：{content}")
             else:
@@ -676,11 +1112,12 @@ B站评论区聊天记录：
         try:
             client = await self._get_client()
             start_time = time.time()
-            response = await client.post(
-                self.api_url,
-                headers=self.headers,
-                json=request_data
-            )
+            async with self._inflight_sem:
+                response = await client.post(
+                    self.api_url,
+                    headers=self.headers,
+                    json=request_data
+                )
             api_latency = time.time() - start_time
             
             if response.status_code == 200:
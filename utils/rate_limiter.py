@@ -13,6 +13,9 @@
 """
 
 import asyncio
+import heapq
+import itertools
+import random
 import time
 from typing import Optional
 from dataclasses import dataclass
@@ -57,41 +60,63 @@ class RateLimiter:
         self.config = config or RateLimitConfig()
         self.tokens = self.config.burst  # 初始满桶
         self.last_update = time.time()
-        self._lock = asyncio.Lock()
+        # 条件变量：resize() 可以立即唤醒等待者重新评估容量
+        self._cond = asyncio.Condition()
         self._initialized = True
-    
+
     async def acquire(self, tokens: int = 1, timeout: Optional[float] = None) -> bool:
         """
         获取令牌
-        
+
         Args:
             tokens: 需要的令牌数
             timeout: 等待超时时间（秒），None表示一直等待
-            
+
         Returns:
             是否成功获取
         """
         start_time = time.time()
-        
-        while True:
-            async with self._lock:
+
+        async with self._cond:
+            while True:
                 self._add_tokens()
-                
+
                 if self.tokens >= tokens:
                     self.tokens -= tokens
                     return True
-                
+
                 # 计算需要等待的时间
                 needed = tokens - self.tokens
                 wait_time = needed / self.config.rate
-                
+
                 if timeout is not None:
                     elapsed = time.time() - start_time
                     if elapsed + wait_time > timeout:
                         return False
-            
-            # 在锁外等待
-            await asyncio.sleep(min(wait_time, 0.1))
+
+                # 等待期间释放条件锁；超时后重新评估，resize()会提前唤醒
+                try:
+                    await asyncio.wait_for(
+                        self._cond.wait(),
+                        timeout=min(wait_time, 0.1)
+                    )
+                except asyncio.TimeoutError:
+                    pass
+
+    async def resize(self, rate: Optional[float] = None, burst: Optional[int] = None):
+        """
+        运行时调整限流容量（如根据429/预算动态收紧或放宽）
+
+        在条件锁内更新配置并唤醒所有等待者，避免直接改字段导致的竞态。
+        """
+        async with self._cond:
+            self._add_tokens()
+            if rate is not None:
+                self.config.rate = rate
+            if burst is not None:
+                self.config.burst = burst
+                self.tokens = min(self.tokens, burst)
+            self._cond.notify_all()
     
     def _add_tokens(self):
         """根据时间流逝添加令牌"""
@@ -141,14 +166,114 @@ class RateLimiter:
         }
 
 
+class PriorityRateLimiter(RateLimiter):
+    """
+    带优先级的令牌桶限流器
+
+    等待者进入 (priority, seq, future) 最小堆，由单一派发循环按优先级
+    依次从令牌桶取令牌放行。数字越小优先级越高：限流吃紧时，
+    用户可见的操作（如发送回复）可以插队到后台轮询之前。
+    """
+
+    _instances: dict = {}
+
+    def __init__(self, name: str, config: RateLimitConfig = None):
+        if self._initialized:
+            return
+
+        super().__init__(name, config)
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._drain_task: Optional[asyncio.Task] = None
+
+    async def acquire(self, tokens: int = 1, timeout: Optional[float] = None,
+                      priority: int = 5) -> bool:
+        """
+        按优先级获取令牌
+
+        Args:
+            tokens: 需要的令牌数
+            timeout: 等待超时时间（秒），None表示一直等待
+            priority: 优先级，数字越小越先放行（默认5，后台轮询级）
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), tokens, future))
+
+        # 惰性启动派发循环（队列清空后自动结束）
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.create_task(self._drain())
+
+        if timeout is None:
+            return await future
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
+
+    async def _drain(self):
+        """按优先级顺序从令牌桶取令牌，逐个放行等待者"""
+        while self._waiters:
+            _, _, tokens, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # 等待者已超时/被取消
+            granted = await super().acquire(tokens)
+            if not future.done():
+                future.set_result(granted)
+
+
+class AdaptiveDelay:
+    """自适应退避延迟 - 健康时零等待，被风控后指数退避
+
+    与令牌桶互补：令牌桶限制平均速率，这里处理"偶发风控"——
+    平时不插入任何sleep，观察到412/-403后延迟翻倍（带随机抖动，
+    避免重试同步），连续成功后逐步衰减回零。
+
+    使用示例：
+        delay = AdaptiveDelay("search")
+        await delay.wait()          # 调用前等待（健康时立即返回）
+        try:
+            await api_call()
+            delay.record_success()
+        except Exception as e:
+            if "412" in str(e):
+                delay.record_throttle()
+    """
+
+    def __init__(self, name: str, min_delay: float = 0.2, max_delay: float = 2.0):
+        self.name = name
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = 0.0
+
+    async def wait(self):
+        """按当前退避水平等待；delay为0时不产生任何开销"""
+        if self.delay > 0:
+            await asyncio.sleep(self.delay * random.uniform(0.5, 1.5))
+
+    def record_success(self):
+        """成功一次，延迟衰减10%，低于阈值直接归零"""
+        self.delay = 0.0 if self.delay < 0.05 else self.delay * 0.9
+
+    def record_throttle(self):
+        """观察到风控信号，延迟翻倍（夹在[min_delay, max_delay]内）"""
+        self.delay = min(self.max_delay, max(self.min_delay, self.delay * 2))
+
+
 class RateLimitExceeded(Exception):
     """限流异常"""
     pass
 
 
 # 预定义的限流器
-# B站API：保守设置，避免风控
-bilibili_limiter = RateLimiter("bilibili", RateLimitConfig(rate=0.5, burst=3))  # 每秒0.5个
+# B站API按端点拆分：搜索突发不再挤占评论拉取的令牌，
+# 各端点独立配额，上游保护不变、有效吞吐更高
+
+# 视频搜索：低频调用，预算小
+bilibili_search_limiter = RateLimiter("bilibili_search", RateLimitConfig(rate=0.2, burst=2))
+
+# 评论拉取（根评论/子评论）：支持优先级（新视频处理可插队后台轮询）
+bilibili_comments_limiter = PriorityRateLimiter("bilibili_comments", RateLimitConfig(rate=0.5, burst=3))
 
 # DeepSeek API：较宽松
 deepseek_limiter = RateLimiter("deepseek", RateLimitConfig(rate=2.0, burst=10))
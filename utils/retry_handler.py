@@ -120,7 +120,10 @@ class RetryHandler:
         error_msg = str(exception).lower()
         retryable_keywords = [
             'timeout', 'connection', 'temporary', 'unavailable',
-            'rate limit', 'too many requests', '503', '502', '504'
+            'rate limit', 'too many requests', '503', '502', '504',
+            # B站风控/频率限制是瞬时的，退避后重试通常能成功；
+            # -401（登录失效）不在列表里，重试无意义
+            '412', '-403',
         ]
         
         for keyword in retryable_keywords: